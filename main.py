@@ -6,6 +6,7 @@ AI Test Generator - CLI для работы с CLI агентами.
 которые сами генерируют тесты на основе промптов и современных QA методологий.
 """
 import sys
+from collections import Counter
 from pathlib import Path
 
 import click
@@ -65,8 +66,8 @@ def _load_raw_requirements(
 
     parser = StructuredRequirementParser()
     total_requirements = 0
-    layer_stats = {}
-    component_stats = {}
+    layer_stats = Counter()
+    component_stats = Counter()
     skipped_files = 0
 
     for file_path in sorted(files):
@@ -92,11 +93,9 @@ def _load_raw_requirements(
                 req_obj.tags = parsed.tags
                 req_obj.title = parsed.title
 
-            layer_name = parsed.layer.value
-            component_name = parsed.component.value
-            layer_stats[layer_name] = layer_stats.get(layer_name, 0) + 1
-            component_stats[component_name] = component_stats.get(component_name, 0) + 1
-            total_requirements += 1
+        layer_stats.update(p.layer.value for p in parsed_requirements)
+        component_stats.update(p.component.value for p in parsed_requirements)
+        total_requirements += len(parsed_requirements)
 
     sm.save()
     return total_requirements, layer_stats, component_stats, skipped_files
@@ -127,9 +126,9 @@ def _prepare_tests_from_state() -> int:
     analyzer = RequirementAnalyzer()
     total_added = 0
 
-    for req_info in helper.get_pending_requirements():
+    for req_info in helper.get_pending_requirements_with_text():
         req_id = req_info["id"]
-        req_text = helper.get_requirement_text(req_id)
+        req_text = req_info["text"]
         analysis = analyzer.analyze(req_text, req_id)
         helper.add_analysis(req_id=req_id, **analyzer.to_helper_format(analysis))
 
@@ -225,13 +224,10 @@ def _prepare_tests_from_state() -> int:
 
 
 def _compute_layer_component_stats(session) -> tuple[dict, dict]:
-    layer_stats: dict[str, int] = {}
-    component_stats: dict[str, int] = {}
-    for req in session.requirements:
-        layer = getattr(req, "layer", "api") or "api"
-        component = getattr(req, "component", "fullstack") or "fullstack"
-        layer_stats[layer] = layer_stats.get(layer, 0) + 1
-        component_stats[component] = component_stats.get(component, 0) + 1
+    requirements = session.requirements
+    # RequirementState всегда содержит layer/component — getattr с умолчанием не нужен
+    layer_stats = Counter(req.layer or "api" for req in requirements)
+    component_stats = Counter(req.component or "fullstack" for req in requirements)
     return layer_stats, component_stats
 
 
@@ -508,8 +504,8 @@ def load_structured(file_path: str, auto_detect: bool):
         session = sm.get_or_create_session(agent_type="cli_agent")
 
         # Статистика по слоям и компонентам
-        layer_stats = {}
-        component_stats = {}
+        layer_stats = Counter()
+        component_stats = Counter()
 
         # Добавляем требования в state с расширенными метаданными
         for parsed in parsed_requirements:
@@ -528,10 +524,8 @@ def load_structured(file_path: str, auto_detect: bool):
                 req_obj.title = parsed.title
 
             # Собираем статистику
-            layer_name = parsed.layer.value
-            component_name = parsed.component.value
-            layer_stats[layer_name] = layer_stats.get(layer_name, 0) + 1
-            component_stats[component_name] = component_stats.get(component_name, 0) + 1
+            layer_stats[parsed.layer.value] += 1
+            component_stats[parsed.component.value] += 1
 
         sm.save()
 
@@ -10,13 +10,18 @@
 import re
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Optional
+from typing import Iterator, Optional, Sequence
 
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
 
+def _count_keywords(text_lower: str, keywords) -> int:
+    """Считает, сколько ключевых слов встречается в тексте (без генератора на Python-уровне)."""
+    return sum(map(text_lower.__contains__, keywords))
+
+
 class RequirementLayer(str, Enum):
     """Слой тестирования."""
     API = "api"
@@ -32,19 +37,21 @@ class RequirementComponent(str, Enum):
     FULLSTACK = "fullstack"
 
 
-@dataclass
+@dataclass(slots=True)
 class ParsedRequirement:
     """Распарсенное требование с метаданными."""
     title: str
     description: str
     layer: RequirementLayer = RequirementLayer.API
     component: RequirementComponent = RequirementComponent.FULLSTACK
+    # tags остается list: вызывающий код склеивает его и сохраняет в state
     tags: list[str] = field(default_factory=list)
-    sub_requirements: list[str] = field(default_factory=list)
-    technical_notes: list[str] = field(default_factory=list)
-    constraints: list[str] = field(default_factory=list)
-    ui_elements: list[str] = field(default_factory=list)
-    api_endpoints: list[str] = field(default_factory=list)
+    # Поля только для чтения: по умолчанию общий пустой кортеж вместо нового list
+    sub_requirements: Sequence[str] = ()
+    technical_notes: Sequence[str] = ()
+    constraints: Sequence[str] = ()
+    ui_elements: Sequence[str] = ()
+    api_endpoints: Sequence[str] = ()
     raw_text: str = ""
 
 
@@ -70,52 +77,83 @@ class StructuredRequirementParser:
         'integration': re.compile(r'\[Integration\]', re.IGNORECASE),
     }
 
+    # Литералы тегов в нижнем регистре для быстрого поиска подстрокой
+    TAG_LITERALS = (
+        ('back', '[back]'),
+        ('front', '[front]'),
+        ('api', '[api]'),
+        ('ui', '[ui]'),
+        ('e2e', '[e2e]'),
+        ('integration', '[integration]'),
+    )
+
     # Ключевые слова для автоопределения слоя
     LAYER_KEYWORDS = {
-        RequirementLayer.API: [
+        RequirementLayer.API: frozenset({
             'endpoint', 'api', 'rest', 'graphql', 'http', 'request', 'response',
             'post', 'get', 'put', 'delete', 'patch', 'json', 'запрос', 'ответ',
             'эндпоинт', 'метод'
-        ],
-        RequirementLayer.UI: [
+        }),
+        RequirementLayer.UI: frozenset({
             'кнопка', 'форма', 'поле', 'ввод', 'экран', 'страница', 'модальное',
             'button', 'form', 'field', 'input', 'screen', 'page', 'modal',
             'dropdown', 'checkbox', 'календарь', 'calendar', 'drag', 'drop',
             'клик', 'click', 'hover', 'scroll'
-        ],
-        RequirementLayer.INTEGRATION: [
+        }),
+        RequirementLayer.INTEGRATION: frozenset({
             'интеграция', 'integration', 'webhook', 'callback', 'llm', 'ai',
             'внешний', 'external', 'third-party', 'сторонний'
-        ],
-        RequirementLayer.E2E: [
+        }),
+        RequirementLayer.E2E: frozenset({
             'сценарий', 'scenario', 'end-to-end', 'e2e', 'пользователь',
             'user journey', 'flow', 'путь пользователя'
-        ]
+        })
     }
 
     # Ключевые слова для автоопределения компонента
     COMPONENT_KEYWORDS = {
-        RequirementComponent.BACKEND: [
+        RequirementComponent.BACKEND: frozenset({
             'backend', 'сервер', 'server', 'база данных', 'database', 'db',
             'таблица', 'table', 'миграция', 'migration', 'sql', 'nosql',
             'кэш', 'cache', 'redis', 'queue', 'очередь'
-        ],
-        RequirementComponent.FRONTEND: [
+        }),
+        RequirementComponent.FRONTEND: frozenset({
             'frontend', 'фронтенд', 'ui', 'ux', 'компонент', 'component',
             'react', 'vue', 'angular', 'css', 'стиль', 'style', 'анимация',
             'animation', 'responsive', 'адаптивный'
-        ]
+        })
     }
 
     # Паттерны для извлечения данных
+    MD_HEADER_SPLIT_PATTERN = re.compile(r'\n(?=#{1,3}\s+)')
+    _MD_HEADER_RE = re.compile(r'^#+\s+[^\n]+\n?')
     NUMBERED_LIST_PATTERN = re.compile(r'^\s*(\d+)\.\s+(.+)$', re.MULTILINE)
     BULLET_LIST_PATTERN = re.compile(r'^\s*[-•*]\s+(.+)$', re.MULTILINE)
+    # Нумерованный пункт | маркированный пункт | строка с тегом — за один проход.
+    # Пробелы по краям пункта остаются вне групп, strip() не нужен
+    SUB_REQUIREMENT_PATTERN = re.compile(
+        r'^\s*(?:(\d+)\.\s+(\S.*?)|[-•*]\s+(\S.*?)|'
+        r'\[(Back|Front|API|UI|E2E|Integration)\]\s+(\S.*?))[^\S\n]*$',
+        re.IGNORECASE | re.MULTILINE
+    )
+    # Текст заметки до первой пустой строки или конца текста.
+    # Развернутый цикл вместо ленивого (.+?)(?=\n\n|\Z) не требует возвратов
     TECHNICAL_NOTE_PATTERN = re.compile(
-        r'(?:Техническая реализация|Technical notes?|Технические заметки?)[:\s]*(.+?)(?=\n\n|\Z)',
+        r'(?:Техническая реализация|Technical notes?|Технические заметки?)[:\s]*'
+        r'(.[^\n]*(?:\n(?!\n)[^\n]*)*)',
         re.IGNORECASE | re.DOTALL
     )
+    # Маркер списка в начале строки заметки ("- ", "• ", "1. ", "- 1. ")
+    _LIST_MARKER_RE = re.compile(r'^(?:[-•*]\s*)?(?:\d+\.\s*)?')
     CONSTRAINT_PATTERN = re.compile(
-        r'(?:Максим(?:ум|ально)|Миним(?:ум|ально)|Ограничени[ея]|Constraint|Limit)[:\s]*(.+?)(?=\n|$)',
+        r'(?:Максим(?:ум|ально)|Миним(?:ум|ально)|Ограничени[ея]|Constraint|Limit)[:\s]*([^\n]+)',
+        re.IGNORECASE
+    )
+    # Паттерны типа "не более X", "минимум Y" одной альтернативой, по группе на паттерн.
+    # Lookahead нужен, чтобы не терять пересечения ("до 50 символов" внутри "от 2 до 50 символов")
+    ADDITIONAL_CONSTRAINT_RE = re.compile(
+        r'(?=(не более \d+)|(не менее \d+)|(максимум \d+)|(минимум \d+)|'
+        r'(до \d+ (?:символов|файлов|элементов|МБ|KB|GB))|(от \d+ до \d+))',
         re.IGNORECASE
     )
     ENDPOINT_PATTERN = re.compile(
@@ -145,14 +183,21 @@ class StructuredRequirementParser:
         lines = text.strip().split('\n')
         title = self._extract_title(lines)
 
+        # Текст в нижнем регистре считаем один раз: для тегов и автоопределения
+        text_lower = text.lower()
+
         # Извлекаем теги
-        tags = self._extract_tags(text)
+        tags = self._extract_tags(text_lower)
+
+        # Ключевые слова анализируются только при auto_detect
+        # (и только если теги не определяют слой/компонент сами)
+        scan_text = text_lower if auto_detect else ""
 
         # Определяем компонент на основе тегов
-        component = self._determine_component(tags, text if auto_detect else "")
+        component = self._determine_component(tags, scan_text)
 
         # Определяем слой
-        layer = self._determine_layer(tags, text if auto_detect else "")
+        layer = self._determine_layer(tags, scan_text)
 
         # Извлекаем подтребования (нумерованные списки)
         sub_requirements = self._extract_sub_requirements(text)
@@ -178,11 +223,12 @@ class StructuredRequirementParser:
             layer=layer,
             component=component,
             tags=tags,
-            sub_requirements=sub_requirements,
-            technical_notes=technical_notes,
-            constraints=constraints,
-            ui_elements=ui_elements,
-            api_endpoints=api_endpoints,
+            # Пустые списки не храним — остается общий пустой кортеж по умолчанию
+            sub_requirements=sub_requirements or (),
+            technical_notes=technical_notes or (),
+            constraints=constraints or (),
+            ui_elements=ui_elements or (),
+            api_endpoints=api_endpoints or (),
             raw_text=text
         )
 
@@ -213,19 +259,7 @@ class StructuredRequirementParser:
         if separator in text:
             blocks = text.split(separator)
         else:
-            # Пробуем разделить по markdown заголовкам
-            blocks = re.split(r'\n(?=#{1,3}\s+)', text)
-            # Если не получилось, пробуем разделение по "сырым" заголовкам
-            if len(blocks) == 1:
-                blocks = self._split_by_titles(text)
-            else:
-                expanded = []
-                for block in blocks:
-                    if self._has_multiple_titles(block):
-                        expanded.extend(self._split_by_titles(block))
-                    else:
-                        expanded.append(block)
-                blocks = expanded
+            blocks = list(self._iter_blocks(text))
 
         requirements = []
         for block in blocks:
@@ -255,16 +289,12 @@ class StructuredRequirementParser:
                 return line
         return "Untitled Requirement"
 
-    def _extract_tags(self, text: str) -> list[str]:
-        """Извлекает все теги из текста."""
-        tags = []
-        for tag_name, pattern in self.TAG_PATTERNS.items():
-            if pattern.search(text):
-                tags.append(tag_name)
-        return tags
+    def _extract_tags(self, text_lower: str) -> list[str]:
+        """Извлекает все теги из текста в нижнем регистре."""
+        return [tag_name for tag_name, literal in self.TAG_LITERALS if literal in text_lower]
 
-    def _determine_component(self, tags: list[str], text: str) -> RequirementComponent:
-        """Определяет компонент на основе тегов и ключевых слов."""
+    def _determine_component(self, tags: list[str], text_lower: str) -> RequirementComponent:
+        """Определяет компонент на основе тегов и ключевых слов (text_lower — текст в нижнем регистре)."""
         has_back = 'back' in tags or 'api' in tags
         has_front = 'front' in tags or 'ui' in tags
 
@@ -275,25 +305,25 @@ class StructuredRequirementParser:
         elif has_front:
             return RequirementComponent.FRONTEND
 
-        # Автоопределение по ключевым словам
-        if text:
-            text_lower = text.lower()
-            backend_score = sum(1 for kw in self.COMPONENT_KEYWORDS[RequirementComponent.BACKEND]
-                               if kw in text_lower)
-            frontend_score = sum(1 for kw in self.COMPONENT_KEYWORDS[RequirementComponent.FRONTEND]
-                                if kw in text_lower)
-
-            if backend_score > 0 and frontend_score > 0:
-                return RequirementComponent.FULLSTACK
-            elif backend_score > frontend_score:
+        # Автоопределение по ключевым словам: важен только факт наличия,
+        # поэтому поиск останавливается на первом совпадении
+        if text_lower:
+            has_backend_kw = any(map(
+                text_lower.__contains__, self.COMPONENT_KEYWORDS[RequirementComponent.BACKEND]
+            ))
+            has_frontend_kw = any(map(
+                text_lower.__contains__, self.COMPONENT_KEYWORDS[RequirementComponent.FRONTEND]
+            ))
+
+            if has_backend_kw and not has_frontend_kw:
                 return RequirementComponent.BACKEND
-            elif frontend_score > backend_score:
+            if has_frontend_kw and not has_backend_kw:
                 return RequirementComponent.FRONTEND
 
         return RequirementComponent.FULLSTACK
 
-    def _determine_layer(self, tags: list[str], text: str) -> RequirementLayer:
-        """Определяет слой тестирования на основе тегов и ключевых слов."""
+    def _determine_layer(self, tags: list[str], text_lower: str) -> RequirementLayer:
+        """Определяет слой тестирования на основе тегов и ключевых слов (text_lower — текст в нижнем регистре)."""
         # Явные теги имеют приоритет
         if 'e2e' in tags:
             return RequirementLayer.E2E
@@ -305,42 +335,43 @@ class StructuredRequirementParser:
             return RequirementLayer.API
 
         # Автоопределение по ключевым словам
-        if text:
-            text_lower = text.lower()
-            scores = {}
+        if text_lower:
+            # Argmax без промежуточного dict; при равенстве побеждает первый слой
+            best_layer, best_score = RequirementLayer.API, 0
             for layer, keywords in self.LAYER_KEYWORDS.items():
-                scores[layer] = sum(1 for kw in keywords if kw in text_lower)
-
-            if scores:
-                max_layer = max(scores, key=scores.get)
-                if scores[max_layer] > 0:
-                    return max_layer
+                score = _count_keywords(text_lower, keywords)
+                if score > best_score:
+                    best_layer, best_score = layer, score
+            return best_layer
 
         return RequirementLayer.API
 
     def _extract_sub_requirements(self, text: str) -> list[str]:
         """Извлекает подтребования из нумерованных и маркированных списков."""
-        sub_reqs = []
+        numbered, bullets, tagged = [], [], []
+        for match in self.SUB_REQUIREMENT_PATTERN.finditer(text):
+            numbered_item, bullet_item, tag_item = match.group(2, 3, 5)
+            if numbered_item is not None:
+                numbered.append(numbered_item)
+            elif bullet_item is not None:
+                bullets.append(bullet_item)
+            else:
+                tagged.append(tag_item)
 
-        # Нумерованные списки
-        for match in self.NUMBERED_LIST_PATTERN.finditer(text):
-            sub_reqs.append(match.group(2).strip())
+        # Нумерованные списки идут первыми
+        sub_reqs = numbered
+        seen = set(numbered)
 
-        # Маркированные списки
-        for match in self.BULLET_LIST_PATTERN.finditer(text):
-            item = match.group(1).strip()
-            # Пропускаем если это уже есть в нумерованном списке
-            if item not in sub_reqs:
+        # Маркированные списки: пропускаем если это уже есть в нумерованном списке
+        for item in bullets:
+            if item not in seen:
+                seen.add(item)
                 sub_reqs.append(item)
 
         # Строки с тегами [Back]/[Front]/[API]/[UI]
-        tag_line_pattern = re.compile(
-            r'^\s*\[(Back|Front|API|UI|E2E|Integration)\]\s+(.+)$',
-            re.IGNORECASE | re.MULTILINE
-        )
-        for match in tag_line_pattern.finditer(text):
-            item = match.group(2).strip()
-            if item and item not in sub_reqs:
+        for item in tagged:
+            if item not in seen:
+                seen.add(item)
                 sub_reqs.append(item)
 
         return sub_reqs
@@ -349,14 +380,13 @@ class StructuredRequirementParser:
         """Извлекает технические заметки."""
         notes = []
         for match in self.TECHNICAL_NOTE_PATTERN.finditer(text):
-            note_text = match.group(1).strip()
+            note_text = match.group(1)
             # Разбиваем на отдельные заметки если есть списки
             for line in note_text.split('\n'):
                 line = line.strip()
                 if line and not line.startswith('#'):
                     # Удаляем маркеры списков
-                    line = re.sub(r'^[-•*]\s*', '', line)
-                    line = re.sub(r'^\d+\.\s*', '', line)
+                    line = self._LIST_MARKER_RE.sub('', line, count=1)
                     if line:
                         notes.append(line)
         return notes
@@ -368,18 +398,13 @@ class StructuredRequirementParser:
             constraint = match.group(0).strip()
             constraints.append(constraint)
 
-        # Также ищем паттерны типа "не более X", "минимум Y"
-        additional_patterns = [
-            r'не более \d+',
-            r'не менее \d+',
-            r'максимум \d+',
-            r'минимум \d+',
-            r'до \d+ (?:символов|файлов|элементов|МБ|KB|GB)',
-            r'от \d+ до \d+',
-        ]
-        for pattern in additional_patterns:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                constraint = match.group(0)
+        # Также ищем паттерны типа "не более X", "минимум Y".
+        # Находки группируются по паттерну, чтобы сохранить порядок паттернов
+        hits_by_pattern = [[] for _ in range(self.ADDITIONAL_CONSTRAINT_RE.groups)]
+        for match in self.ADDITIONAL_CONSTRAINT_RE.finditer(text):
+            hits_by_pattern[match.lastindex - 1].append(match.group(match.lastindex))
+        for hits in hits_by_pattern:
+            for constraint in hits:
                 if constraint not in constraints:
                     constraints.append(constraint)
 
@@ -398,7 +423,7 @@ class StructuredRequirementParser:
         """Извлекает API эндпоинты."""
         endpoints = []
         for match in self.ENDPOINT_PATTERN.finditer(text):
-            endpoint = match.group(0).strip()
+            endpoint = match.group(0)
             if endpoint not in endpoints:
                 endpoints.append(endpoint)
         return endpoints
@@ -409,7 +434,8 @@ class StructuredRequirementParser:
         description = text.strip()
 
         # Удаляем markdown заголовок
-        description = re.sub(r'^#+\s+[^\n]+\n?', '', description)
+        if description.startswith('#'):
+            description = self._MD_HEADER_RE.sub('', description, count=1)
 
         # Удаляем заголовок если он есть в начале
         if description.startswith(title):
@@ -417,37 +443,48 @@ class StructuredRequirementParser:
 
         return description
 
-    def _split_by_titles(self, text: str) -> list[str]:
-        """Разбивает текст на блоки по 'сырым' заголовкам."""
-        lines = text.splitlines()
+    def _iter_blocks(self, text: str) -> Iterator[str]:
+        """
+        Разбивает текст без явного разделителя на блоки требований.
+
+        Сначала делит по markdown заголовкам, затем внутри каждого куска
+        по "сырым" заголовкам. Если markdown заголовков нет, текст всегда
+        делится по "сырым" заголовкам.
+        """
+        segments = self.MD_HEADER_SPLIT_PATTERN.split(text)
+        force_split = len(segments) == 1
+        for segment in segments:
+            yield from self._split_segment(segment, force_split)
+
+    def _split_segment(self, text: str, force_split: bool) -> list[str]:
+        """
+        Разбивает кусок текста по 'сырым' заголовкам за один проход по строкам.
+
+        Без force_split кусок делится, только если в нем больше одного заголовка,
+        иначе возвращается как есть.
+        """
         blocks = []
         current = []
         prev_blank = True
+        header_count = 0
 
-        for line in lines:
-            if self._is_section_header(line, prev_blank) and current:
-                blocks.append("\n".join(current).strip())
-                current = []
+        for line in text.splitlines():
+            if self._is_section_header(line, prev_blank):
+                header_count += 1
+                if current:
+                    blocks.append("\n".join(current).strip())
+                    current = []
             current.append(line)
             prev_blank = not line.strip()
 
+        if not force_split and header_count < 2:
+            return [text]
+
         if current:
             blocks.append("\n".join(current).strip())
 
         return [b for b in blocks if b]
 
-    def _has_multiple_titles(self, text: str) -> bool:
-        """Проверяет, есть ли несколько заголовков в блоке."""
-        count = 0
-        prev_blank = True
-        for line in text.splitlines():
-            if self._is_section_header(line, prev_blank):
-                count += 1
-                if count > 1:
-                    return True
-            prev_blank = not line.strip()
-        return False
-
     def _is_section_header(self, line: str, prev_blank: bool) -> bool:
         """Определяет, выглядит ли строка как заголовок нового блока."""
         if not prev_blank:
@@ -7,15 +7,24 @@ Pipeline Orchestrator - единая точка входа для генерац
 Вместо 4+ команд, пользователь запускает одну:
   python main.py generate --source requirements/raw
 """
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path
+import os
 import re
-from dataclasses import dataclass
-from typing import Optional, Literal
+import time
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, Literal
 from enum import Enum
 
-from src.state.state_manager import StateManager, RequirementStatus
+from src.agents.test_agent import GenerationResult, TestCase
+from src.state.state_manager import StateManager, RequirementStatus, RequirementAnalysis
 from src.generators.test_case_generator import TestCaseGenerator
 from src.parsers.structured_parser import (
+    ParsedRequirement,
     StructuredRequirementParser,
     get_layer_display_name,
 )
@@ -39,6 +48,200 @@ from src.utils.input_validation import validate_file_path, validate_file_size
 logger = setup_logger(__name__)
 
 
+# Минимум требований на один процесс пула при генерации тестов
+_GENERATE_CHUNK_SIZE = 8
+
+
+def _resolve_workers(task_count: int, env_var: str) -> int:
+    """
+    Определяет число процессов пула для task_count задач.
+
+    Значение переменной окружения env_var имеет приоритет, иначе cpu_count() - 1.
+    """
+    env_value = os.getenv(env_var)
+    if env_value and env_value.isdigit():
+        workers = int(env_value)
+    else:
+        workers = (os.cpu_count() or 1) - 1
+    return max(1, min(workers, task_count))
+
+
+class _KeywordGroups:
+    """
+    Определяет, какие группы ключевых слов встречаются в тексте.
+
+    Поиск подстрочный, как у `keyword in text`.
+    """
+
+    def __init__(self, groups: dict[str, tuple[str, ...]]):
+        self.groups = groups
+
+    def find(self, text: str) -> set[str]:
+        """Возвращает имена групп, ключевые слова которых встречаются в тексте."""
+        return {
+            name for name, keywords in self.groups.items()
+            if any(keyword in text for keyword in keywords)
+        }
+
+
+# Ключевые слова CRUD; порядок групп задает приоритет типа операции
+_CRUD_KEYWORDS = (
+    ('create', ('создан', 'create', 'добавл', 'add', 'new', 'регистр', 'register')),
+    ('update', ('обнов', 'update', 'изменен', 'edit', 'редакт', 'modify')),
+    ('delete', ('удал', 'delete', 'remove')),
+    ('search', ('поиск', 'search', 'найти', 'find', 'фильтр', 'filter')),
+    ('read', ('получ', 'get', 'read', 'просмотр', 'view', 'показ', 'show', 'отобра', 'display')),
+)
+
+# Ключевые слова в замечаниях пользователя
+_FEEDBACK_KEYWORDS = _KeywordGroups({
+    'integration': ('интеграц', 'integration', 'e2e', 'сквозн'),
+    'backend': ('backend', 'бек', 'api'),
+    'frontend': ('frontend', 'фронт', 'ui'),
+})
+
+# Признаки требования, от которых зависит набор генерируемых тестов
+_FEATURE_KEYWORDS = _KeywordGroups({
+    'calendar': ('календар', 'calendar'),
+    'file_upload': ('фото', 'файл', 'upload', 'photo', 'file'),
+    'multiple_files': ('нескольк', 'multiple'),
+    'back_tag': ('[back]',),
+    'front_tag': ('[front]',),
+})
+
+# Сценарии E2E тестов по ключевым словам; первый найденный побеждает
+_E2E_SCENARIOS = (
+    (('регистр', 'register'), "регистрация пользователя"),
+    (('вход', 'login'), "авторизация пользователя"),
+    (('создан', 'create'), "создание объекта через UI и проверка в API"),
+    (('загрузк', 'upload'), "загрузка файла через UI и проверка сохранения"),
+)
+
+# Правила валидации упоминаемых в требовании полей (порядок задает порядок тестов)
+_FIELD_VALIDATION_RULES = {
+    'email': 'формат email (обязательное)',
+    'телефон': 'формат телефона',
+    'phone': 'формат телефона',
+    'пароль': 'минимум 8 символов (обязательное)',
+    'password': 'минимум 8 символов (обязательное)',
+    'имя': 'не пустое (обязательное)',
+    'name': 'не пустое (обязательное)',
+    'дата': 'корректный формат даты',
+    'date': 'корректный формат даты',
+    'url': 'валидный URL',
+    'сумма': 'положительное число',
+    'amount': 'положительное число',
+    'возраст': 'целое число от 0 до 150',
+    'age': 'целое число от 0 до 150',
+}
+
+# Время ответа в тексте требования: все варианты за один проход. Lookahead находит
+# и перекрывающиеся вхождения; вариант выбирается по приоритету, а не по позиции
+_RESPONSE_TIME_RE = re.compile(
+    r'(?=(?P<ms>\d+)\s*(?:мс|ms|millisecond)'
+    r'|(?P<sec>\d+)\s*(?:сек|sec|second)'
+    r'|(?:время ответа|response time)[^\d]*(?P<phrase>\d+)'
+    r'|(?P<msr>\d+)\s*(?:миллисекунд))'
+)
+_RESPONSE_TIME_PRIORITY = ('ms', 'sec', 'phrase', 'msr')
+_SECONDS_MARK_RE = re.compile(r'сек|sec')
+
+# LLM/AI/ИИ как отдельные токены
+_LLM_KEYWORDS_RE = re.compile(r"(?<!\w)(?:llm|ai|ии)(?!\w)")
+
+# Фрагмент текста о статусах и перечисленные в нем значения в кавычках
+_STATUS_SEGMENT_RE = re.compile(r'статус[^\n.]*', re.IGNORECASE)
+_QUOTED_VALUE_RE = re.compile(r'"([^"]+)"|\'([^\']+)\'')
+
+# Имена полей boundary_values, задающих количество и размер файлов
+_FILE_COUNT_FIELDS = frozenset({"фото", "photo", "photos", "файлы", "files", "file"})
+_FILE_SIZE_FIELDS = frozenset({"file_size", "size", "размер"})
+
+# Теги требования, относящие его к backend/frontend слою (в нижнем регистре)
+_BACK_TAGS = frozenset({'back', 'backend', 'api'})
+_FRONT_TAGS = frozenset({'front', 'frontend', 'ui'})
+
+# Парсер не хранит состояния — один экземпляр на процесс (в т.ч. на воркер пула)
+_PARSER = StructuredRequirementParser()
+
+
+@lru_cache(maxsize=512)
+def _parse_requirement_cached(text: str, auto_detect: bool) -> ParsedRequirement:
+    """
+    Парсит текст требования с кэшем в пределах процесса.
+
+    Кэш помогает только тем, кто запускает pipeline несколько раз в одном процессе:
+    CLI делает один прогон, а дубликаты текстов StateManager отсекает по хэшу.
+    Результат используется только для чтения.
+    """
+    return _PARSER.parse(text, auto_detect=auto_detect)
+
+
+@lru_cache(maxsize=2048)
+def _find_validation_fields(text_lower: str) -> tuple[str, ...]:
+    """Возвращает поля, упомянутые в тексте, в порядке _FIELD_VALIDATION_RULES (с кэшем)."""
+    return tuple(field_name for field_name in _FIELD_VALIDATION_RULES if field_name in text_lower)
+
+
+def _parse_file(
+    file_path: Path,
+    auto_detect: bool
+) -> tuple[Path, list[ParsedRequirement], Optional[str]]:
+    """
+    Читает и парсит один файл требований.
+
+    Функция уровня модуля, чтобы ее можно было выполнять в пуле процессов.
+
+    Returns:
+        (file_path, parsed_requirements, skip_reason)
+    """
+    is_valid, error = validate_file_size(file_path)
+    if not is_valid:
+        return file_path, [], error
+
+    # Читаем байты напрямую, минуя TextIOWrapper; переводы строк нормализуем как read_text
+    content = file_path.read_bytes().decode("utf-8")
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return file_path, _PARSER.parse_multiple(content, auto_detect=auto_detect), None
+
+
+def _build_requirement_tests_in_worker(
+    analyzer: RequirementAnalyzer,
+    req_id: str,
+    req_text: str,
+    tags: tuple[str, ...],
+    feedback_hints: dict
+) -> tuple[object, list[dict], Counter]:
+    """
+    Строит тест-кейсы одного требования в процессе пула.
+
+    Returns:
+        (analysis, тест-кейсы, время техник в наносекундах)
+    """
+    timer = _StageTimer()
+    analysis, tests = PipelineOrchestrator._build_requirement_tests(
+        analyzer, timer, req_id, req_text, tags, feedback_hints
+    )
+    return analysis, tests, timer.times_ns
+
+
+class _StageTimer:
+    """Накапливает время выполнения этапов pipeline в наносекундах."""
+
+    def __init__(self):
+        self.times_ns: Counter = Counter()
+
+    @contextmanager
+    def measure(self, stage: str):
+        """Добавляет к этапу stage время выполнения блока with."""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.times_ns[stage] += time.perf_counter_ns() - start
+
+
 class SourceType(str, Enum):
     """Тип источника требований."""
     RAW = "raw"  # requirements/raw/*.md
@@ -74,19 +277,12 @@ class PipelineResult:
     success: bool
     requirements_loaded: int = 0
     tests_generated: int = 0
-    export_paths: list[str] = None
-    layer_stats: dict = None
-    component_stats: dict = None
+    export_paths: list[str] = field(default_factory=list)
+    layer_stats: dict = field(default_factory=dict)
+    component_stats: dict = field(default_factory=dict)
     skipped_files: int = 0
     error_message: Optional[str] = None
-
-    def __post_init__(self):
-        if self.export_paths is None:
-            self.export_paths = []
-        if self.layer_stats is None:
-            self.layer_stats = {}
-        if self.component_stats is None:
-            self.component_stats = {}
+    stage_times_ns: dict = field(default_factory=dict)
 
 
 class PipelineOrchestrator:
@@ -100,10 +296,20 @@ class PipelineOrchestrator:
     4. Экспорт результатов
     """
 
+    # Загрузчик требований для каждого типа источника
+    _LOADERS = {
+        SourceType.RAW: "_load_from_raw",
+        SourceType.DEMO: "_load_from_demo",
+        SourceType.FILE: "_load_from_file",
+        SourceType.CONFLUENCE: "_load_from_confluence",
+    }
+
     def __init__(self, config: PipelineConfig):
         self.config = config
         self.sm: Optional[StateManager] = None
         self.helper: Optional[TestGeneratorHelper] = None
+        self.analyzer = RequirementAnalyzer()
+        self.timer = _StageTimer()
 
     def run(self) -> PipelineResult:
         """
@@ -112,34 +318,44 @@ class PipelineOrchestrator:
         Returns:
             PipelineResult с результатами выполнения
         """
+        self.timer = _StageTimer()
+        timer = self.timer
         try:
             # Шаг 1: Подготовка
             logger.info("Шаг 1/5: Подготовка проекта...")
-            self._prepare()
+            with timer.measure("prepare"):
+                self._prepare()
 
             # Шаг 2: Загрузка требований
             logger.info("Шаг 2/5: Загрузка требований...")
-            req_count, layer_stats, component_stats, skipped = self._load_requirements()
+            with timer.measure("load"):
+                req_count, layer_stats, component_stats, skipped = self._load_requirements()
 
             if req_count == 0:
                 return PipelineResult(
                     success=False,
-                    error_message="Требования не найдены в источнике"
+                    error_message="Требования не найдены в источнике",
+                    stage_times_ns=dict(timer.times_ns)
                 )
 
             # Шаг 3: Структурирование требований
             if self.config.structure_requirements:
                 logger.info("Шаг 3/5: Структурирование требований...")
-                self._structure_requirements()
+                with timer.measure("structure"):
+                    self._structure_requirements()
 
             # Шаг 4: Генерация тестов
             logger.info("Шаг 4/5: Генерация тест-кейсов...")
-            test_count = self._generate_tests()
+            # Помощник пишет state на каждый тест-кейс — сохраняем один раз в конце этапа
+            with timer.measure("generate"), self.helper.sm.batch():
+                test_count = self._generate_tests()
 
             # Шаг 5: Экспорт
             logger.info("Шаг 5/5: Экспорт результатов...")
-            export_paths = self._export_results()
+            with timer.measure("export"):
+                export_paths = self._export_results()
 
+            self._log_stage_times()
             return PipelineResult(
                 success=True,
                 requirements_loaded=req_count,
@@ -147,16 +363,26 @@ class PipelineOrchestrator:
                 export_paths=export_paths,
                 layer_stats=layer_stats,
                 component_stats=component_stats,
-                skipped_files=skipped
+                skipped_files=skipped,
+                stage_times_ns=dict(timer.times_ns)
             )
 
         except Exception as e:
             logger.exception("Ошибка выполнения pipeline")
             return PipelineResult(
                 success=False,
-                error_message=str(e)
+                error_message=str(e),
+                stage_times_ns=dict(timer.times_ns)
             )
 
+    def _log_stage_times(self):
+        """Логирует время этапов pipeline (в миллисекундах)."""
+        summary = ", ".join(
+            f"{stage}={elapsed / 1_000_000:.1f}ms"
+            for stage, elapsed in self.timer.times_ns.items()
+        )
+        logger.info(f"Время этапов: {summary}")
+
     def _prepare(self):
         """Подготовка: очистка state, создание сессии."""
         if self.config.clean_state:
@@ -178,16 +404,10 @@ class PipelineOrchestrator:
         Returns:
             (count, layer_stats, component_stats, skipped_files)
         """
-        if self.config.source_type == SourceType.RAW:
-            return self._load_from_raw()
-        elif self.config.source_type == SourceType.DEMO:
-            return self._load_from_demo()
-        elif self.config.source_type == SourceType.FILE:
-            return self._load_from_file()
-        elif self.config.source_type == SourceType.CONFLUENCE:
-            return self._load_from_confluence()
-        else:
+        loader_name = self._LOADERS.get(self.config.source_type)
+        if loader_name is None:
             raise ValueError(f"Неподдерживаемый источник: {self.config.source_type}")
+        return getattr(self, loader_name)()
 
     def _load_from_raw(self) -> tuple[int, dict, dict, int]:
         """Загружает требования из requirements/raw/."""
@@ -201,57 +421,60 @@ class PipelineOrchestrator:
         if not root.exists() or not root.is_dir():
             raise ValueError(f"Папка не найдена: {dir_path}")
 
-        files = [
-            p for p in root.iterdir()
-            if p.is_file()
-            and p.suffix.lower() in {".md", ".txt"}
-            and p.name.lower() != "readme.md"
-        ]
+        # DirEntry кэширует тип файла — без лишнего stat на каждый элемент
+        with os.scandir(root) as entries:
+            files = [
+                Path(entry.path) for entry in entries
+                if entry.is_file()
+                and os.path.splitext(entry.name)[1].lower() in {".md", ".txt"}
+                and entry.name.lower() != "readme.md"
+            ]
         
         if not files:
             raise ValueError("В папке нет файлов .md/.txt")
 
-        parser = StructuredRequirementParser()
         total_requirements = 0
-        layer_stats = {}
-        component_stats = {}
+        layer_stats = Counter()
+        component_stats = Counter()
         skipped_files = 0
 
-        for file_path in sorted(files):
-            is_valid, error = validate_file_size(file_path)
-            if not is_valid:
-                logger.warning(f"Пропущен файл {file_path.name}: {error}")
-                skipped_files += 1
-                continue
-
-            content = file_path.read_text(encoding="utf-8")
-            parsed_requirements = parser.parse_multiple(
-                content,
-                auto_detect=self.config.auto_detect
-            )
-
-            for parsed in parsed_requirements:
-                req = self.sm.add_requirement(
-                    text=parsed.raw_text or parsed.description,
-                    source="file",
-                    source_ref=str(file_path)
+        # Конвейер: чтение и парсинг файлов идут в пуле процессов, а результаты
+        # применяются к состоянию по мере готовности, в порядке файлов.
+        # StateManager не сериализуется, поэтому запись остается в одном потоке.
+        # Порядок файлов задает id требований (REQ-001, ...) и то, какой из дубликатов
+        # текста сохранится, а порядок os.scandir не определен — сортировка обязательна.
+        sorted_files = sorted(files)
+        workers = _resolve_workers(len(sorted_files), "LOAD_WORKERS")
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext()
+        with pool, self.sm.batch():
+            mapper = pool.map if workers > 1 else map
+            parse_results = mapper(_parse_file, sorted_files, repeat(self.config.auto_detect))
+
+            for file_path, parsed_requirements, error in parse_results:
+                if error:
+                    logger.warning(f"Пропущен файл {file_path.name}: {error}")
+                    skipped_files += 1
+                    continue
+
+                requirements = self.sm.add_requirements_bulk(
+                    {
+                        "text": parsed.raw_text or parsed.description,
+                        "source": "file",
+                        "source_ref": str(file_path),
+                    }
+                    for parsed in parsed_requirements
                 )
 
-                # Обновляем расширенные поля
-                req_obj = self.sm.find_requirement_by_id(req.id)
-                if req_obj:
-                    req_obj.layer = parsed.layer.value
-                    req_obj.component = parsed.component.value
-                    req_obj.tags = parsed.tags
-                    req_obj.title = parsed.title
+                for req, parsed in zip(requirements, parsed_requirements):
+                    # Обновляем расширенные поля (возвращаются объекты из сессии)
+                    req.layer = parsed.layer.value
+                    req.component = parsed.component.value
+                    req.tags = parsed.tags
+                    req.title = parsed.title
 
-                layer_name = parsed.layer.value
-                component_name = parsed.component.value
-                layer_stats[layer_name] = layer_stats.get(layer_name, 0) + 1
-                component_stats[component_name] = component_stats.get(component_name, 0) + 1
-                total_requirements += 1
-
-        self.sm.save()
+                layer_stats.update(p.layer.value for p in parsed_requirements)
+                component_stats.update(p.component.value for p in parsed_requirements)
+                total_requirements += len(parsed_requirements)
         logger.info(f"Загружено {total_requirements} требований из {len(files)} файлов")
         return total_requirements, layer_stats, component_stats, skipped_files
 
@@ -280,13 +503,13 @@ class PipelineOrchestrator:
             raise ValueError(f"Невалидный файл: {error}")
 
         generator = TestCaseGenerator(state_manager=self.sm)
-        requirements = generator.load_from_file(str(demo_file))
+        with self.sm.batch():
+            requirements = generator.load_from_file(str(demo_file))
 
         if not requirements:
             raise ValueError("Требования не найдены в демо-файле")
 
-        session = self.sm.load()
-        layer_stats, component_stats = self._compute_layer_component_stats(session)
+        layer_stats, component_stats = self._compute_layer_component_stats(self.sm.state)
         
         logger.info(f"Загружено {len(requirements)} демо-требований")
         return len(requirements), layer_stats, component_stats, 0
@@ -306,13 +529,13 @@ class PipelineOrchestrator:
             raise ValueError(f"Невалидный файл: {error}")
 
         generator = TestCaseGenerator(state_manager=self.sm)
-        requirements = generator.load_from_file(str(file_path))
+        with self.sm.batch():
+            requirements = generator.load_from_file(str(file_path))
 
         if not requirements:
             raise ValueError("Требования не найдены в файле")
 
-        session = self.sm.load()
-        layer_stats, component_stats = self._compute_layer_component_stats(session)
+        layer_stats, component_stats = self._compute_layer_component_stats(self.sm.state)
         
         logger.info(f"Загружено {len(requirements)} требований из файла")
         return len(requirements), layer_stats, component_stats, 0
@@ -323,32 +546,32 @@ class PipelineOrchestrator:
             raise ValueError("Не указан PAGE_ID для Confluence")
 
         generator = TestCaseGenerator(state_manager=self.sm)
-        requirements = generator.load_from_confluence(self.config.source_path)
+        with self.sm.batch():
+            requirements = generator.load_from_confluence(self.config.source_path)
 
         if not requirements:
             raise ValueError("Требования не найдены на странице Confluence")
 
-        session = self.sm.load()
-        layer_stats, component_stats = self._compute_layer_component_stats(session)
+        layer_stats, component_stats = self._compute_layer_component_stats(self.sm.state)
         
         logger.info(f"Загружено {len(requirements)} требований из Confluence")
         return len(requirements), layer_stats, component_stats, 0
 
     def _structure_requirements(self) -> int:
         """Нормализует требования и заполняет метаданные для генерации."""
-        session = self.sm.load()
+        # Состояние уже в памяти после загрузки — перечитывать файл не нужно
+        session = self.sm.state
         if not session:
             return 0
 
-        parser = StructuredRequirementParser()
         structured_count = 0
 
         for req in session.requirements:
-            parsed = parser.parse(req.text, auto_detect=self.config.auto_detect)
+            parsed = _parse_requirement_cached(req.text, self.config.auto_detect)
             req.title = parsed.title
             req.layer = parsed.layer.value
             req.component = parsed.component.value
-            req.tags = sorted(set(req.tags + parsed.tags))
+            req.tags = sorted({*req.tags, *parsed.tags})
             req.structured_text = self._build_structured_text(parsed)
             structured_count += 1
 
@@ -359,79 +582,163 @@ class PipelineOrchestrator:
     def _generate_tests(self) -> int:
         """
         Генерирует тест-кейсы для всех требований.
-        
+
+        Тесты строятся без записи в state (при большом объеме — в пуле процессов),
+        а анализ, тест-кейсы и статусы записываются по мере готовности, в порядке
+        требований.
+
         Returns:
             Количество сгенерированных тестов
         """
-        analyzer = RequirementAnalyzer()
-        total_added = 0
+        analyzer = self.analyzer
+        timer = self.timer
 
-        pending_requirements = self.helper.get_pending_requirements()
+        # Полные тексты приходят вместе со списком — без поиска по id на каждое требование
+        pending_requirements = self.helper.get_pending_requirements_with_text()
         logger.info(f"Обработка {len(pending_requirements)} требований...")
 
+        # Индекс по id вместо линейного поиска на каждое требование
+        session = self.sm.state
+        requirements_by_id = {r.id: r for r in session.requirements} if session else {}
+
+        jobs = []
         for req_info in pending_requirements:
             req_id = req_info["id"]
-            req_text = self.helper.get_requirement_text(req_id)
-            req_obj = self.sm.find_requirement_by_id(req_id)
-            
-            logger.debug(f"Анализ требования {req_id}...")
-            
-            # Анализируем требование
+            req_obj = requirements_by_id.get(req_id)
+            # Подсказки извлекаем здесь: они меняют объект требования из self.sm
+            jobs.append((
+                req_id,
+                req_info["text"],
+                tuple(getattr(req_obj, 'tags', None) or ()),
+                self._extract_feedback_hints(req_obj),
+            ))
+
+        # Требования независимы друг от друга — при достаточном объеме строим тесты
+        # в пуле процессов. Запись в state остается в этом процессе.
+        workers = _resolve_workers(len(jobs) // _GENERATE_CHUNK_SIZE, "GENERATE_WORKERS")
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext()
+
+        # Конвейер: пока пул строит тесты следующих требований, готовые уже
+        # записываются. Порядок изменений state тот же, что при поочередной обработке
+        total_added = 0
+        with pool as executor:
+            for req_id, analysis, tests in self._iter_built_tests(jobs, executor):
+                with timer.measure("generate.write"):
+                    self.helper.add_analysis(req_id=req_id, **analyzer.to_helper_format(analysis))
+                    if tests:
+                        total_added += self.helper.add_test_cases_bulk(req_id, tests)
+                    # Отмечаем требование как завершенное
+                    self.helper.mark_requirement_completed(req_id)
+
+        logger.info(f"Сгенерировано {total_added} тест-кейсов")
+        return total_added
+
+    def _iter_built_tests(
+        self,
+        jobs: list[tuple[str, str, tuple[str, ...], dict]],
+        executor: Optional[ProcessPoolExecutor]
+    ) -> Iterator[tuple[str, object, list[dict]]]:
+        """Выдает (req_id, analysis, тест-кейсы) по мере готовности, в порядке jobs."""
+        analyzer = self.analyzer
+        timer = self.timer
+        if executor is None:
+            for req_id, req_text, tags, feedback_hints in jobs:
+                analysis, tests = self._build_requirement_tests(
+                    analyzer, timer, req_id, req_text, tags, feedback_hints
+                )
+                yield req_id, analysis, tests
+            return
+
+        results = executor.map(
+            _build_requirement_tests_in_worker,
+            repeat(analyzer),
+            *zip(*jobs),
+            chunksize=_GENERATE_CHUNK_SIZE
+        )
+        for (req_id, *_), (analysis, tests, times_ns) in zip(jobs, results):
+            # Время техник суммируется по всем процессам пула
+            timer.times_ns.update(times_ns)
+            yield req_id, analysis, tests
+
+    @classmethod
+    def _build_requirement_tests(
+        cls,
+        analyzer: RequirementAnalyzer,
+        timer: _StageTimer,
+        req_id: str,
+        req_text: str,
+        tags: tuple[str, ...],
+        feedback_hints: dict
+    ) -> tuple[object, list[dict]]:
+        """
+        Анализирует одно требование и строит его тест-кейсы, не трогая state.
+
+        Зависит только от аргументов, поэтому может выполняться в пуле процессов.
+        """
+        logger.debug(f"Анализ требования {req_id}...")
+        
+        # Анализируем требование
+        with timer.measure("generate.analyze"):
             analysis = analyzer.analyze(req_text, req_id)
-            self.helper.add_analysis(req_id=req_id, **analyzer.to_helper_format(analysis))
-
-            base_tc_id = f"TC-{req_id.split('-')[1]}"
-            text_lower = req_text.lower()
-            feedback_hints = self._extract_feedback_hints(req_obj)
-
-            # Определяем теги слоёв заранее (для layer gating)
-            req_tags = getattr(req_obj, 'tags', []) or []
-            has_back = any(t.lower() in {'back', 'backend', 'api'} for t in req_tags) or '[back]' in text_lower
-            has_front = any(t.lower() in {'front', 'frontend', 'ui'} for t in req_tags) or '[front]' in text_lower
-            front_only = has_front and not has_back
-
-            # Boundary Value Analysis
-            if not front_only and analysis.endpoint:
-                for field, bounds in analysis.boundary_values.items():
-                    if bounds.get("type") == "file_size_mb":
-                        continue
-                    if bounds.get("type") == "count" and field.lower() in {"фото", "photo", "photos", "файлы", "files", "file"}:
-                        continue
-                    min_val = bounds.get("min")
-                    max_val = bounds.get("max")
-                    if isinstance(min_val, int) and isinstance(max_val, int) and min_val <= max_val:
-                        bva_tests = create_boundary_test_cases(
-                            req_id=req_id,
-                            base_tc_id=f"{base_tc_id}-{field.upper()}",
-                            field_name=field,
-                            min_value=min_val,
-                            max_value=max_val,
-                            valid_example=(min_val + max_val) // 2,
-                            invalid_low=min_val - 1,
-                            invalid_high=max_val + 1,
-                            endpoint=analysis.endpoint
-                        )
-                        total_added += self.helper.add_test_cases_bulk(req_id, bva_tests)
 
-            # Equivalence Partitioning
-            if not front_only and analysis.endpoint:
-                for field, classes in analysis.equivalence_classes.items():
+        base_tc_id = f"TC-{req_id.split('-')[1]}"
+        text_lower = req_text.lower()
+        # Общие признаки требования; уточнения календаря и E2E проверяются по месту
+        features = _FEATURE_KEYWORDS.find(text_lower)
+        techniques = frozenset(analysis.suggested_techniques)
+
+        # Определяем теги слоёв заранее (для layer gating)
+        tags_lower = {t.lower() for t in tags}
+        has_back = not _BACK_TAGS.isdisjoint(tags_lower) or 'back_tag' in features
+        has_front = not _FRONT_TAGS.isdisjoint(tags_lower) or 'front_tag' in features
+        front_only = has_front and not has_back
+        tests: list[dict] = []
+        field_tests_enabled = not front_only and bool(analysis.endpoint)
+
+        # id тест-кейсов по полям: BVA и EP обычно разбирают одни и те же поля
+        field_tc_ids = {
+            field_name: f"{base_tc_id}-{field_name.upper()}"
+            for field_name in analysis.boundary_values.keys() | analysis.equivalence_classes.keys()
+        } if field_tests_enabled else {}
+
+        # Boundary Value Analysis
+        with timer.measure("generate.bva"):
+            if field_tests_enabled:
+                for field_name, min_val, max_val in cls._iter_bva_ranges(analysis.boundary_values):
+                    bva_tests = create_boundary_test_cases(
+                        req_id=req_id,
+                        base_tc_id=field_tc_ids[field_name],
+                        field_name=field_name,
+                        min_value=min_val,
+                        max_value=max_val,
+                        valid_example=(min_val + max_val) // 2,
+                        invalid_low=min_val - 1,
+                        invalid_high=max_val + 1,
+                        endpoint=analysis.endpoint
+                    )
+                    tests.extend(bva_tests)
+
+        # Equivalence Partitioning
+        with timer.measure("generate.ep"):
+            if field_tests_enabled:
+                for field_name, classes in analysis.equivalence_classes.items():
                     valid_values = classes.get("valid", [])
                     invalid_values = classes.get("invalid", [])
                     if valid_values or invalid_values:
                         ep_tests = create_equivalence_test_cases(
                             req_id=req_id,
-                            base_tc_id=f"{base_tc_id}-{field.upper()}",
-                            field_name=field,
+                            base_tc_id=field_tc_ids[field_name],
+                            field_name=field_name,
                             valid_values=valid_values,
                             invalid_values=invalid_values,
                             endpoint=analysis.endpoint
                         )
-                        total_added += self.helper.add_test_cases_bulk(req_id, ep_tests)
+                        tests.extend(ep_tests)
 
-            # Calendar tests
-            if "календар" in text_lower or "calendar" in text_lower:
-                status_filters = self._extract_statuses_for_ui(req_text)
+        # Calendar tests
+        with timer.measure("generate.calendar"):
+            if "calendar" in features:
+                status_filters = cls._extract_statuses_for_ui(req_text)
                 location_hint = None
                 if "домик" in text_lower and "администр" in text_lower:
                     location_hint = "в разделе в домиках над администрированием"
@@ -452,13 +759,13 @@ class PipelineOrchestrator:
                     check_current_datetime_highlight=check_current_datetime,
                     check_month_view=check_month_view
                 )
-                total_added += self.helper.add_test_cases_bulk(req_id, calendar_tests)
+                tests.extend(calendar_tests)
 
-            # File upload tests
-            if any(token in text_lower for token in ["фото", "файл", "upload", "photo", "file"]):
-                max_files = self._extract_max_files(analysis.boundary_values)
-                max_size_mb = self._extract_max_size_mb(analysis.boundary_values)
-                if max_files is None and ("нескольк" in text_lower or "multiple" in text_lower):
+        # File upload tests
+        with timer.measure("generate.upload"):
+            if "file_upload" in features:
+                max_files, max_size_mb = cls._extract_file_limits(analysis.boundary_values)
+                if max_files is None and "multiple_files" in features:
                     max_files = 10
                 if max_files:
                     upload_tests = create_file_upload_tests(
@@ -469,10 +776,11 @@ class PipelineOrchestrator:
                         max_files=max_files,
                         ui_element="photo-upload"
                     )
-                    total_added += self.helper.add_test_cases_bulk(req_id, upload_tests)
+                    tests.extend(upload_tests)
 
-            # LLM integration tests
-            if "llm_integration" in analysis.suggested_techniques:
+        # LLM integration tests
+        with timer.measure("generate.llm"):
+            if "llm_integration" in techniques:
                 llm_tests = [
                     create_integration_test_case(
                         base_tc_id=f"{base_tc_id}-LLM-001",
@@ -496,11 +804,12 @@ class PipelineOrchestrator:
                         tags=["llm", "timeout"]
                     ),
                 ]
-                total_added += self.helper.add_test_cases_bulk(req_id, llm_tests)
+                tests.extend(llm_tests)
 
-            # API CRUD тесты для [Back] требований
+        # API CRUD тесты для [Back] требований
+        with timer.measure("generate.api_crud"):
             if has_back and analysis.endpoint:
-                req_type = self._infer_crud_type(text_lower)
+                req_type = cls._infer_crud_type(text_lower)
                 if req_type:
                     api_tests = create_api_crud_test_suite(
                         req_id=req_id,
@@ -511,12 +820,13 @@ class PipelineOrchestrator:
                         preconditions=['API сервер доступен', 'Пользователь авторизован'],
                         sample_data={'id': 1, 'name': 'TestObject'}
                     )
-                    total_added += self.helper.add_test_cases_bulk(req_id, api_tests)
+                    tests.extend(api_tests)
 
-            # State Transition тесты
+        # State Transition тесты
+        with timer.measure("generate.state_transition"):
             if not front_only and analysis.endpoint and analysis.states and len(analysis.states) > 1:
-                valid_transitions = self._infer_valid_transitions(analysis.states)
-                invalid_transitions = self._infer_invalid_transitions(analysis.states)
+                valid_transitions = cls._infer_valid_transitions(analysis.states)
+                invalid_transitions = cls._infer_invalid_transitions(analysis.states)
                 if valid_transitions or invalid_transitions:
                     st_tests = create_state_transition_tests(
                         req_id=req_id,
@@ -527,11 +837,12 @@ class PipelineOrchestrator:
                         invalid_transitions=invalid_transitions,
                         preconditions=['API сервер доступен', 'Объект существует']
                     )
-                    total_added += self.helper.add_test_cases_bulk(req_id, st_tests)
+                    tests.extend(st_tests)
 
-            # Performance тесты
+        # Performance тесты
+        with timer.measure("generate.performance"):
             if analysis.endpoint and has_back:
-                max_response_time = self._extract_response_time(req_text)
+                max_response_time = cls._extract_response_time(req_text)
                 perf_tests = create_performance_tests(
                     req_id=req_id,
                     base_tc_id=base_tc_id,
@@ -540,16 +851,18 @@ class PipelineOrchestrator:
                     max_response_time_ms=max_response_time,
                     preconditions=['API сервер доступен', 'Система под нормальной нагрузкой']
                 )
-                total_added += self.helper.add_test_cases_bulk(req_id, perf_tests)
+                tests.extend(perf_tests)
 
-            # E2E тесты для [Back]+[Front]
+        # E2E тесты для [Back]+[Front]
+        with timer.measure("generate.e2e"):
             if has_back and has_front:
-                e2e_tests = self._create_e2e_tests(req_id, base_tc_id, analysis, text_lower)
-                total_added += self.helper.add_test_cases_bulk(req_id, e2e_tests)
+                e2e_tests = cls._create_e2e_tests(req_id, base_tc_id, analysis, text_lower)
+                tests.extend(e2e_tests)
 
-            # Validation тесты для форм
-            if not front_only and ('ui_form' in analysis.suggested_techniques or has_front):
-                field_validations = self._extract_field_validations(req_text, analysis)
+        # Validation тесты для форм
+        with timer.measure("generate.validation"):
+            if not front_only and ('ui_form' in techniques or has_front):
+                field_validations = cls._extract_field_validations(req_text, analysis)
                 if field_validations:
                     val_tests = create_validation_test_cases(
                         req_id=req_id,
@@ -559,9 +872,10 @@ class PipelineOrchestrator:
                         fields_validation=field_validations,
                         preconditions=['Форма открыта', 'Пользователь авторизован']
                     )
-                    total_added += self.helper.add_test_cases_bulk(req_id, val_tests)
+                    tests.extend(val_tests)
 
-            # Feedback-based heuristics
+        # Feedback-based heuristics
+        with timer.measure("generate.feedback"):
             if feedback_hints.get("add_integration"):
                 integration_test = create_integration_test_case(
                     base_tc_id=f"{base_tc_id}-FB-INT-001",
@@ -571,21 +885,17 @@ class PipelineOrchestrator:
                     technique="feedback_integration",
                     tags=["feedback", "integration"]
                 )
-                total_added += self.helper.add_test_cases_bulk(req_id, [integration_test])
+                tests.append(integration_test)
 
-            # Отмечаем требование как завершенное
-            self.helper.mark_requirement_completed(req_id)
-
-        logger.info(f"Сгенерировано {total_added} тест-кейсов")
-        return total_added
+        return analysis, tests
 
     @staticmethod
     def _extract_statuses_for_ui(text: str) -> list[str]:
         """Извлекает перечисление статусов для UI проверки отображения."""
         statuses = []
-        for match in re.finditer(r'статус[^\n.]*', text, re.IGNORECASE):
+        for match in _STATUS_SEGMENT_RE.finditer(text):
             segment = match.group(0)
-            quoted = re.findall(r'"([^"]+)"|\'([^\']+)\'', segment)
+            quoted = _QUOTED_VALUE_RE.findall(segment)
             for item in quoted:
                 val = (item[0] or item[1]).strip()
                 if val and len(val) < 30:
@@ -595,25 +905,27 @@ class PipelineOrchestrator:
     @staticmethod
     def _build_structured_text(parsed) -> str:
         """Собирает нормализованный текст требования из распарсенных данных."""
-        lines = [parsed.title]
-        if parsed.description:
-            lines.append(parsed.description.strip())
-        if parsed.sub_requirements:
-            lines.append("Sub-requirements:")
-            lines.extend(f"- {item}" for item in parsed.sub_requirements)
-        if parsed.constraints:
-            lines.append("Constraints:")
-            lines.extend(f"- {item}" for item in parsed.constraints)
-        if parsed.technical_notes:
-            lines.append("Technical notes:")
-            lines.extend(f"- {item}" for item in parsed.technical_notes)
-        if parsed.api_endpoints:
-            lines.append("API endpoints:")
-            lines.extend(f"- {item}" for item in parsed.api_endpoints)
-        if parsed.ui_elements:
-            lines.append("UI elements:")
-            lines.extend(f"- {item}" for item in parsed.ui_elements)
-        return "\n".join(line for line in lines if line)
+        return "\n".join(PipelineOrchestrator._iter_structured_lines(parsed))
+
+    @staticmethod
+    def _iter_structured_lines(parsed) -> Iterator[str]:
+        """Выдает непустые строки структурированного текста требования."""
+        if parsed.title:
+            yield parsed.title
+        description = parsed.description.strip() if parsed.description else ""
+        if description:
+            yield description
+        for header, items in (
+            ("Sub-requirements:", parsed.sub_requirements),
+            ("Constraints:", parsed.constraints),
+            ("Technical notes:", parsed.technical_notes),
+            ("API endpoints:", parsed.api_endpoints),
+            ("UI elements:", parsed.ui_elements),
+        ):
+            if items:
+                yield header
+                for item in items:
+                    yield f"- {item}"
 
     @staticmethod
     def _extract_feedback_hints(req_obj) -> dict:
@@ -623,13 +935,13 @@ class PipelineOrchestrator:
         feedback_text = " ".join(getattr(req_obj, "review_feedback", []) or [])
         if not feedback_text:
             return {}
-        text = feedback_text.lower()
-        add_integration = any(token in text for token in ["интеграц", "integration", "e2e", "сквозн"])
-        if "backend" in text or "бек" in text or "api" in text:
+        found = _FEEDBACK_KEYWORDS.find(feedback_text.lower())
+        add_integration = "integration" in found
+        if "backend" in found:
             if getattr(req_obj, "component", None) == "fullstack":
                 req_obj.component = "backend"
             req_obj.layer = "api"
-        if "frontend" in text or "фронт" in text or "ui" in text:
+        if "frontend" in found:
             if getattr(req_obj, "component", None) == "fullstack":
                 req_obj.component = "frontend"
             req_obj.layer = "ui"
@@ -638,22 +950,9 @@ class PipelineOrchestrator:
     @staticmethod
     def _infer_crud_type(text_lower: str) -> Optional[str]:
         """Определяет тип CRUD операции из текста требования."""
-        create_keywords = ['создан', 'create', 'добавл', 'add', 'new', 'регистр', 'register']
-        read_keywords = ['получ', 'get', 'read', 'просмотр', 'view', 'показ', 'show', 'отобра', 'display']
-        update_keywords = ['обнов', 'update', 'изменен', 'edit', 'редакт', 'modify']
-        delete_keywords = ['удал', 'delete', 'remove']
-        search_keywords = ['поиск', 'search', 'найти', 'find', 'фильтр', 'filter']
-
-        if any(kw in text_lower for kw in create_keywords):
-            return 'create'
-        if any(kw in text_lower for kw in update_keywords):
-            return 'update'
-        if any(kw in text_lower for kw in delete_keywords):
-            return 'delete'
-        if any(kw in text_lower for kw in search_keywords):
-            return 'search'
-        if any(kw in text_lower for kw in read_keywords):
-            return 'read'
+        for req_type, keywords in _CRUD_KEYWORDS:
+            if any(kw in text_lower for kw in keywords):
+                return req_type
         return None
 
     @staticmethod
@@ -663,13 +962,7 @@ class PipelineOrchestrator:
 
         Предполагает линейную последовательность состояний.
         """
-        if len(states) < 2:
-            return []
-
-        transitions = []
-        for i in range(len(states) - 1):
-            transitions.append((states[i], states[i + 1]))
-        return transitions
+        return list(zip(states, states[1:]))
 
     @staticmethod
     def _infer_invalid_transitions(states: list[str]) -> list[tuple[str, str]]:
@@ -678,13 +971,8 @@ class PipelineOrchestrator:
 
         Обратные переходы в линейной последовательности.
         """
-        if len(states) < 2:
-            return []
-
-        transitions = []
         # Обратные переходы невалидны
-        for i in range(len(states) - 1):
-            transitions.append((states[i + 1], states[i]))
+        transitions = [(current, previous) for previous, current in zip(states, states[1:])]
 
         # Пропуск состояний невалиден
         if len(states) >= 3:
@@ -692,8 +980,8 @@ class PipelineOrchestrator:
 
         return transitions
 
+    @staticmethod
     def _create_e2e_tests(
-        self,
         req_id: str,
         base_tc_id: str,
         analysis,
@@ -703,15 +991,13 @@ class PipelineOrchestrator:
         e2e_tests = []
 
         # Определяем сценарий на основе анализа
-        scenario_name = "полный пользовательский сценарий"
-        if "регистр" in text_lower or "register" in text_lower:
-            scenario_name = "регистрация пользователя"
-        elif "вход" in text_lower or "login" in text_lower:
-            scenario_name = "авторизация пользователя"
-        elif "создан" in text_lower or "create" in text_lower:
-            scenario_name = "создание объекта через UI и проверка в API"
-        elif "загрузк" in text_lower or "upload" in text_lower:
-            scenario_name = "загрузка файла через UI и проверка сохранения"
+        scenario_name = next(
+            (
+                name for keywords, name in _E2E_SCENARIOS
+                if any(kw in text_lower for kw in keywords)
+            ),
+            "полный пользовательский сценарий"
+        )
 
         e2e_tests.append({
             'id': f'{base_tc_id}-E2E-001',
@@ -766,23 +1052,20 @@ class PipelineOrchestrator:
         return e2e_tests
 
     @staticmethod
+    @lru_cache(maxsize=2048)
     def _extract_response_time(text: str) -> int:
         """Извлекает максимальное время ответа из текста требования."""
-        import re
-
-        # Паттерны для поиска времени ответа
-        patterns = [
-            r'(\d+)\s*(?:мс|ms|millisecond)',
-            r'(\d+)\s*(?:сек|sec|second)',
-            r'(?:время ответа|response time)[^\d]*(\d+)',
-            r'(\d+)\s*(?:миллисекунд)',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, text.lower())
-            if match:
-                value = int(match.group(1))
-                if 'сек' in text.lower() or 'sec' in text.lower():
+        text_lower = text.lower()
+        first_values = {}
+        for match in _RESPONSE_TIME_RE.finditer(text_lower):
+            first_values.setdefault(match.lastgroup, match.group(match.lastgroup))
+            if 'ms' in first_values:
+                break
+
+        for kind in _RESPONSE_TIME_PRIORITY:
+            if kind in first_values:
+                value = int(first_values[kind])
+                if _SECONDS_MARK_RE.search(text_lower):
                     return value * 1000
                 return value
 
@@ -792,42 +1075,42 @@ class PipelineOrchestrator:
     @staticmethod
     def _extract_field_validations(text: str, analysis) -> dict[str, str]:
         """Извлекает правила валидации полей из текста и анализа."""
-        validations = {}
-
-        text_lower = text.lower()
-
-        # Ищем упоминания полей и их правил
-        field_patterns = {
-            'email': 'формат email (обязательное)',
-            'телефон': 'формат телефона',
-            'phone': 'формат телефона',
-            'пароль': 'минимум 8 символов (обязательное)',
-            'password': 'минимум 8 символов (обязательное)',
-            'имя': 'не пустое (обязательное)',
-            'name': 'не пустое (обязательное)',
-            'дата': 'корректный формат даты',
-            'date': 'корректный формат даты',
-            'url': 'валидный URL',
-            'сумма': 'положительное число',
-            'amount': 'положительное число',
-            'возраст': 'целое число от 0 до 150',
-            'age': 'целое число от 0 до 150',
+        # Порядок найденных полей — как в _FIELD_VALIDATION_RULES
+        validations = {
+            field_name: _FIELD_VALIDATION_RULES[field_name]
+            for field_name in _find_validation_fields(text.lower())
         }
 
-        for field, rule in field_patterns.items():
-            if field in text_lower:
-                validations[field] = rule
-
-        # Добавляем поля из анализа
+        # Добавляем поля из анализа; упорядоченный кортеж полей кэширован на каждый вход
         if hasattr(analysis, 'inputs') and analysis.inputs:
             for inp in analysis.inputs:
-                inp_lower = inp.lower()
-                for field, rule in field_patterns.items():
-                    if field in inp_lower and field not in validations:
-                        validations[field] = rule
+                for field_name in _find_validation_fields(inp.lower()):
+                    if field_name not in validations:
+                        validations[field_name] = _FIELD_VALIDATION_RULES[field_name]
 
         return validations
 
+    @staticmethod
+    def _to_export_test_case(tc):
+        """Возвращает тест-кейс state для экспорта; копия — только если нужны значения по умолчанию."""
+        if tc.layer and tc.component and tc.tags is not None:
+            return tc
+        return TestCase(
+            id=tc.id,
+            title=tc.title,
+            priority=tc.priority,
+            preconditions=tc.preconditions,
+            steps=tc.steps,
+            expected_result=tc.expected_result,
+            test_type=tc.test_type,
+            technique=tc.technique,
+            layer=tc.layer or 'api',
+            component=tc.component or 'fullstack',
+            tags=tc.tags or [],
+            ui_element=tc.ui_element,
+            api_endpoint=tc.api_endpoint
+        )
+
     def _export_results(self) -> list[str]:
         """
         Экспортирует результаты.
@@ -839,45 +1122,18 @@ class PipelineOrchestrator:
         if not session or not session.requirements:
             raise ValueError("Нет данных для экспорта")
 
-        # Конвертируем state в GenerationResult
-        from src.agents.test_agent import GenerationResult, TestCase, RequirementAnalysis
-        
-        results = []
-        for req in session.requirements:
-            analysis = RequirementAnalysis()
-            if req.analysis:
-                analysis = RequirementAnalysis(
-                    inputs=req.analysis.inputs,
-                    outputs=req.analysis.outputs,
-                    business_rules=req.analysis.business_rules,
-                    states=req.analysis.states
-                )
-
-            test_cases = []
-            for tc in req.test_cases:
-                test_cases.append(TestCase(
-                    id=tc.id,
-                    title=tc.title,
-                    priority=tc.priority,
-                    preconditions=tc.preconditions,
-                    steps=tc.steps,
-                    expected_result=tc.expected_result,
-                    test_type=tc.test_type,
-                    technique=tc.technique,
-                    layer=getattr(tc, 'layer', 'api') or 'api',
-                    component=getattr(tc, 'component', 'fullstack') or 'fullstack',
-                    tags=getattr(tc, 'tags', []) or [],
-                    ui_element=getattr(tc, 'ui_element', None),
-                    api_endpoint=getattr(tc, 'api_endpoint', None)
-                ))
-
-            results.append(GenerationResult(
+        # Конвертируем state в GenerationResult. Экспортеры читают только атрибуты, общие
+        # с объектами state, поэтому анализ и тест-кейсы передаются без копирования
+        results = [
+            GenerationResult(
                 requirement_text=req.text,
-                analysis=analysis,
-                test_cases=test_cases,
+                analysis=req.analysis or RequirementAnalysis(),
+                test_cases=[self._to_export_test_case(tc) for tc in req.test_cases],
                 tokens_used=0,
                 model=self.config.agent_type
-            ))
+            )
+            for req in session.requirements
+        ]
 
         generator = TestCaseGenerator(state_manager=self.sm)
         export_paths = []
@@ -915,42 +1171,67 @@ class PipelineOrchestrator:
     @staticmethod
     def _has_llm_keywords(text_lower: str) -> bool:
         """Проверяет наличие LLM/AI как отдельных токенов, без ложных совпадений."""
-        if re.search(r"(?<!\w)(llm|ai)(?!\w)", text_lower):
-            return True
-        return re.search(r"(?<!\w)ии(?!\w)", text_lower) is not None
-
-    def _extract_max_files(self, boundary_values: dict) -> Optional[int]:
-        """Извлекает максимальное количество файлов из boundary_values."""
-        for field, bounds in boundary_values.items():
-            if bounds.get("type") == "count" and isinstance(bounds.get("max"), int):
-                return bounds["max"]
-            if field.lower() in {"фото", "photo", "photos", "файлы", "files", "file"}:
-                if isinstance(bounds.get("max"), int):
-                    return bounds["max"]
-        return None
+        return _LLM_KEYWORDS_RE.search(text_lower) is not None
 
-    def _extract_max_size_mb(self, boundary_values: dict) -> Optional[float]:
-        """Извлекает максимальный размер файла в МБ из boundary_values."""
-        for field, bounds in boundary_values.items():
-            if bounds.get("type") == "file_size_mb" and isinstance(bounds.get("max"), (int, float)):
-                return bounds["max"]
-            if field.lower() in {"file_size", "size", "размер"}:
-                if isinstance(bounds.get("max"), (int, float)):
-                    return bounds["max"]
-        return None
+    @staticmethod
+    def _iter_bva_ranges(boundary_values: dict) -> Iterator[tuple[str, int, int]]:
+        """Выдает (поле, min, max) для полей с целочисленными границами, кроме файловых."""
+        for field_name, bounds in boundary_values.items():
+            bound_type = bounds.get("type")
+            if bound_type == "file_size_mb":
+                continue
+            if bound_type == "count" and field_name.lower() in _FILE_COUNT_FIELDS:
+                continue
+            min_val = bounds.get("min")
+            max_val = bounds.get("max")
+            if isinstance(min_val, int) and isinstance(max_val, int) and min_val <= max_val:
+                yield field_name, min_val, max_val
+
+    @staticmethod
+    def _extract_file_limits(boundary_values: dict) -> tuple[Optional[int], Optional[float]]:
+        """
+        Извлекает из boundary_values за один проход лимиты загрузки файлов.
+
+        Для каждого лимита берется первое подходящее поле.
+
+        Returns:
+            (максимальное количество файлов, максимальный размер файла в МБ)
+        """
+        max_files = None
+        max_size_mb = None
+        for field_name, bounds in boundary_values.items():
+            max_value = bounds.get("max")
+            if not isinstance(max_value, (int, float)):
+                continue
+            bound_type = bounds.get("type")
+            field_lower = field_name.lower()
+            if (
+                max_files is None
+                and isinstance(max_value, int)
+                and (bound_type == "count" or field_lower in _FILE_COUNT_FIELDS)
+            ):
+                max_files = max_value
+            if max_size_mb is None and (
+                bound_type == "file_size_mb" or field_lower in _FILE_SIZE_FIELDS
+            ):
+                max_size_mb = max_value
+            if max_files is not None and max_size_mb is not None:
+                break
+        return max_files, max_size_mb
 
     def _compute_layer_component_stats(self, session) -> tuple[dict, dict]:
         """Вычисляет статистику по слоям и компонентам."""
-        layer_stats = {}
-        component_stats = {}
-        for req in session.requirements:
-            layer = getattr(req, "layer", "api") or "api"
-            component = getattr(req, "component", "fullstack") or "fullstack"
-            layer_stats[layer] = layer_stats.get(layer, 0) + 1
-            component_stats[component] = component_stats.get(component, 0) + 1
+        requirements = session.requirements
+        # RequirementState всегда содержит layer/component — getattr с умолчанием не нужен
+        layer_stats = Counter(req.layer or "api" for req in requirements)
+        component_stats = Counter(req.component or "fullstack" for req in requirements)
         return layer_stats, component_stats
 
 
+# Значения --source, означающие папку сырых требований
+_RAW_SOURCE_ALIASES = frozenset({"raw", "requirements/raw"})
+
+
 def create_orchestrator_from_args(
     source: str,
     output: Optional[str] = None,
@@ -985,18 +1266,17 @@ def create_orchestrator_from_args(
         allure_jira: Jira link для Allure TestOps
     """
     # Определяем тип источника
-    if source.startswith("confluence:"):
+    scheme, colon, page_id = source.partition(":")
+    if colon and scheme == "confluence":
         source_type = SourceType.CONFLUENCE
-        source_path = source.split(":", 1)[1]
-    elif source in ("raw", "requirements/raw"):
+        source_path = page_id
+    elif source in _RAW_SOURCE_ALIASES:
         source_type = SourceType.RAW
         source_path = "requirements/raw"
     elif source.startswith("demo"):
         source_type = SourceType.DEMO
-        if "/" in source:
-            source_path = source.split("/", 1)[1].replace(".md", "")
-        else:
-            source_path = None
+        _, slash, demo_name = source.partition("/")
+        source_path = demo_name.replace(".md", "") if slash else None
     else:
         # Файл
         source_type = SourceType.FILE
@@ -6,10 +6,11 @@ State Manager для CLI агентов.
 """
 import json
 import hashlib
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from dataclasses import dataclass, field, asdict
-from typing import Optional, Literal
+from typing import Iterable, Optional, Literal
 from enum import Enum
 
 from src.utils.logger import setup_logger
@@ -24,14 +25,53 @@ from src.utils.state_integrity import (
     sign_state_file,
     verify_signature,
     validate_schema,
-    create_backup,
+    replace_with_backup,
     restore_from_backup,
 )
 import os
+import sys
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен — без него state читается и пишется через json
+    orjson = None
 
 logger = setup_logger(__name__)
 
 
+def _read_state_json(path: Path) -> dict:
+    """Читает JSON файла состояния целиком (через orjson, если установлен)."""
+    raw = path.read_bytes()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dump_state_json(data: dict) -> bytes:
+    """
+    Сериализует состояние в компактный JSON (через orjson, если установлен).
+
+    Файл читается только программой; для просмотра — команды state show/context.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # orjson не сериализует, например, целые вне 64 бит — используем json
+            pass
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _text_hash(text: str) -> str:
+    """Короткий хэш текста требования (дедупликация и отслеживание изменений)."""
+    return hashlib.md5(text.encode()).hexdigest()[:12]
+
+
+def _intern_label(value):
+    """Интернирует строковую метку (layer/component), прочитанную из JSON."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class RequirementStatus(str, Enum):
     """Статус обработки требования."""
     PENDING = "pending"           # Ожидает обработки
@@ -43,6 +83,29 @@ class RequirementStatus(str, Enum):
     REVIEW = "review"             # На ревью у пользователя
 
 
+# Статусы по значению: при загрузке состояния минуем Enum.__call__
+_STATUS_LOOKUP = {status.value: status for status in RequirementStatus}
+
+
+def _parse_status(value) -> RequirementStatus:
+    """Возвращает статус требования по значению из JSON."""
+    status = _STATUS_LOOKUP.get(value)
+    # Неизвестное значение — через Enum, чтобы сохранить прежнюю ошибку
+    return status if status is not None else RequirementStatus(value)
+
+
+# Иконки статусов для текстового контекста агента
+_STATUS_ICONS = {
+    RequirementStatus.PENDING: "⏳",
+    RequirementStatus.ANALYZING: "🔍",
+    RequirementStatus.ANALYZED: "📋",
+    RequirementStatus.GENERATING: "⚙️",
+    RequirementStatus.COMPLETED: "✅",
+    RequirementStatus.FAILED: "❌",
+    RequirementStatus.REVIEW: "👀"
+}
+
+
 @dataclass
 class TestCaseState:
     """Состояние тест-кейса."""
@@ -106,12 +169,11 @@ class RequirementState:
 
     def _compute_hash(self) -> str:
         """Вычисляет хэш текста требования."""
-        return hashlib.md5(self.text.encode()).hexdigest()[:12]
+        return _text_hash(self.text)
 
     def has_changed(self, new_text: str) -> bool:
         """Проверяет, изменилось ли требование."""
-        new_hash = hashlib.md5(new_text.encode()).hexdigest()[:12]
-        return new_hash != self.hash
+        return _text_hash(new_text) != self.hash
 
 
 @dataclass
@@ -190,6 +252,16 @@ class StateManager:
         self.project_dir = Path(project_dir) if project_dir else Path.cwd()
         self.state_file = Path(state_file) if state_file else self.project_dir / self.DEFAULT_STATE_FILE
         self.state: Optional[SessionState] = None
+        # Отложенное сохранение внутри batch()
+        self._batch_depth = 0
+        self._save_pending = False
+        # Индексы требований по id и хэшу текста (первое вхождение, как при линейном поиске).
+        # Перестраиваются, если список требований заменен (load) или изменился в обход
+        # add_requirement
+        self._indexed_requirements: Optional[list[RequirementState]] = None
+        self._indexed_count = 0
+        self._requirements_by_id: dict[str, RequirementState] = {}
+        self._requirements_by_hash: dict[str, RequirementState] = {}
         os.environ.setdefault(
             "AI_TEST_GEN_SIGNATURE_KEY",
             str(self.project_dir / ".ai-test-gen-signature-key"),
@@ -221,14 +293,17 @@ class StateManager:
 
     def load(self) -> Optional[SessionState]:
         """Загружает состояние из файла."""
+        # Отложенные изменения не должны потеряться при перечитывании файла
+        if self._save_pending:
+            self._write_state()
+
         if not self.state_file.exists():
             logger.debug(f"Файл состояния не найден: {self.state_file}")
             return None
 
         try:
             needs_resign = False
-            with open(self.state_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = _read_state_json(self.state_file)
 
             # Validate schema before using data
             is_valid_schema, schema_error = validate_schema(data)
@@ -242,8 +317,7 @@ class StateManager:
                 if not verify_signature(data):
                     logger.error("Подпись state невалидна, попытка восстановления из backup")
                     if restore_from_backup(self.state_file):
-                        with open(self.state_file, "r", encoding="utf-8") as f:
-                            data = json.load(f)
+                        data = _read_state_json(self.state_file)
                         is_valid_schema, schema_error = validate_schema(data)
                         if not is_valid_schema:
                             logger.error(f"Невалидная схема backup state: {schema_error}")
@@ -264,6 +338,11 @@ class StateManager:
             ):
                 logger.warning("Несоответствие total_requirements, пересчёт")
                 self.state.progress.total_requirements = len(self.state.requirements)
+            # Дальше счетчик обработанных ведется инкрементально при смене статуса;
+            # в старых файлах он обновлялся только в update_progress
+            self.state.progress.processed_requirements = sum(
+                1 for r in self.state.requirements if r.status == RequirementStatus.COMPLETED
+            )
 
             if needs_resign:
                 self.save()
@@ -275,7 +354,32 @@ class StateManager:
             return None
 
     def save(self) -> bool:
-        """Сохраняет состояние в файл."""
+        """Сохраняет состояние в файл (внутри batch() — при выходе из блока)."""
+        if self._batch_depth:
+            self._save_pending = True
+            return True
+        return self._write_state()
+
+    @contextmanager
+    def batch(self):
+        """
+        Группирует изменения: все save() внутри блока with дают одну запись файла.
+
+        Каждое сохранение переписывает весь state и создает бэкап, поэтому массовые
+        операции (загрузка требований, генерация тестов) стоит выполнять в batch().
+        Файл записывается и при выходе по исключению.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._save_pending:
+                self._write_state()
+
+    def _write_state(self) -> bool:
+        """Записывает состояние в файл."""
+        self._save_pending = False
         if not self.state:
             logger.warning("Нет состояния для сохранения")
             return False
@@ -285,12 +389,8 @@ class StateManager:
             data = self._session_to_dict(self.state)
             data = sign_state_file(data)
 
-            if self.state_file.exists():
-                create_backup(self.state_file)
-
-            with open(self.state_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            self.state_file.chmod(0o600)
+            # Атомарная замена файла; прежняя версия становится бэкапом без копирования
+            replace_with_backup(self.state_file, _dump_state_json(data))
 
             logger.debug(f"Состояние сохранено: {self.state_file}")
             return True
@@ -334,9 +434,10 @@ class StateManager:
             SecurityLogger.log_validation_failure("requirement_length", text, error)
             raise ValueError(error)
 
-        is_valid, error = validate_requirements_count(len(self.state.requirements) + 1)
+        new_count = len(self.state.requirements) + 1
+        is_valid, error = validate_requirements_count(new_count)
         if not is_valid:
-            SecurityLogger.log_validation_failure("requirements_count", str(len(self.state.requirements) + 1), error)
+            SecurityLogger.log_validation_failure("requirements_count", str(new_count), error)
             raise ValueError(error)
 
         # Санитизация и проверка безопасности
@@ -353,21 +454,30 @@ class StateManager:
             display_text = security_result.sanitized
 
         # Проверяем, нет ли уже такого требования (по оригинальному тексту)
-        existing = self.find_requirement_by_text(text)
+        by_id, by_hash = self._requirement_indexes()
+        text_hash = _text_hash(text)
+        existing = by_hash.get(text_hash)
         if existing:
             logger.info(f"Требование уже существует: {existing.id}")
             return existing
 
-        req_id = f"REQ-{len(self.state.requirements) + 1:03d}"
+        req_id = f"REQ-{new_count:03d}"
         requirement = RequirementState(
             id=req_id,
             text=display_text,
             source=source,
-            source_ref=source_ref
+            source_ref=source_ref,
+            # Хэш хранится по сохраняемому тексту; если санитизация его не изменила,
+            # повторно не считаем
+            hash=text_hash if display_text == text else ""
         )
 
         self.state.requirements.append(requirement)
-        self.state.progress.total_requirements = len(self.state.requirements)
+        self.state.progress.total_requirements = new_count
+        # Индексы актуальны (проверено выше) — дополняем их вместо перестроения
+        by_id.setdefault(requirement.id, requirement)
+        by_hash.setdefault(requirement.hash, requirement)
+        self._indexed_count += 1
         self.save()
 
         logger.info(f"Добавлено требование: {req_id}")
@@ -379,33 +489,54 @@ class StateManager:
         source: str = "manual",
         source_ref: Optional[str] = None
     ) -> list[RequirementState]:
-        """Добавляет несколько требований."""
-        requirements = []
-        for text in texts:
-            req = self.add_requirement(text, source, source_ref)
-            requirements.append(req)
-        return requirements
+        """Добавляет несколько требований (файл пишется один раз)."""
+        with self.batch():
+            return [self.add_requirement(text, source, source_ref) for text in texts]
+
+    def add_requirements_bulk(self, items: Iterable[dict]) -> list[RequirementState]:
+        """
+        Добавляет требования пачкой: файл пишется один раз.
+
+        Args:
+            items: Аргументы add_requirement для каждого требования (text, source, source_ref, ...)
+
+        Returns:
+            Требования в порядке items (для дубликатов — уже существующие)
+        """
+        if not self.state:
+            raise ValueError("Сессия не инициализирована")
+
+        with self.batch():
+            return [self.add_requirement(**item) for item in items]
+
+    def _requirement_indexes(self) -> tuple[dict[str, RequirementState], dict[str, RequirementState]]:
+        """Возвращает индексы требований (по id, по хэшу), при необходимости перестраивая их."""
+        requirements = self.state.requirements
+        if requirements is not self._indexed_requirements or len(requirements) != self._indexed_count:
+            by_id: dict[str, RequirementState] = {}
+            by_hash: dict[str, RequirementState] = {}
+            for req in requirements:
+                by_id.setdefault(req.id, req)
+                by_hash.setdefault(req.hash, req)
+            self._requirements_by_id = by_id
+            self._requirements_by_hash = by_hash
+            self._indexed_requirements = requirements
+            self._indexed_count = len(requirements)
+        return self._requirements_by_id, self._requirements_by_hash
 
     def find_requirement_by_text(self, text: str) -> Optional[RequirementState]:
         """Ищет требование по тексту (хэшу)."""
         if not self.state:
             return None
 
-        target_hash = hashlib.md5(text.encode()).hexdigest()[:12]
-        for req in self.state.requirements:
-            if req.hash == target_hash:
-                return req
-        return None
+        return self._requirement_indexes()[1].get(_text_hash(text))
 
     def find_requirement_by_id(self, req_id: str) -> Optional[RequirementState]:
         """Ищет требование по ID."""
         if not self.state:
             return None
 
-        for req in self.state.requirements:
-            if req.id == req_id:
-                return req
-        return None
+        return self._requirement_indexes()[0].get(req_id)
 
     def update_requirement_status(
         self,
@@ -416,9 +547,13 @@ class StateManager:
         """Обновляет статус требования."""
         req = self.find_requirement_by_id(req_id)
         if req:
+            was_completed = req.status == RequirementStatus.COMPLETED
             req.status = status
-            if status == RequirementStatus.COMPLETED:
+            is_completed = status == RequirementStatus.COMPLETED
+            if is_completed:
                 req.processed_at = datetime.now().isoformat()
+            if is_completed != was_completed:
+                self.state.progress.processed_requirements += 1 if is_completed else -1
             if error:
                 req.error = error
             self.save()
@@ -435,6 +570,8 @@ class StateManager:
         """Сохраняет анализ требования."""
         req = self.find_requirement_by_id(req_id)
         if req:
+            if req.status == RequirementStatus.COMPLETED:
+                self.state.progress.processed_requirements -= 1
             req.analysis = RequirementAnalysis(
                 inputs=inputs,
                 outputs=outputs,
@@ -526,9 +663,10 @@ class StateManager:
                 break
 
     def bulk_approve_test_cases(self, req_id: str, test_case_ids: list[str]):
-        """Массово одобряет тест-кейсы."""
-        for tc_id in test_case_ids:
-            self.update_test_case_status(req_id, tc_id, "approved")
+        """Массово одобряет тест-кейсы (одна запись файла)."""
+        with self.batch():
+            for tc_id in test_case_ids:
+                self.update_test_case_status(req_id, tc_id, "approved")
 
     # =========================================================================
     # Работа с прогрессом
@@ -552,10 +690,6 @@ class StateManager:
             self.state.progress.last_action = action
             self.state.progress.last_action_at = datetime.now().isoformat()
 
-        # Пересчитываем прогресс
-        completed = sum(1 for r in self.state.requirements if r.status == RequirementStatus.COMPLETED)
-        self.state.progress.processed_requirements = completed
-
         self.save()
 
     def add_note(self, note: str):
@@ -639,15 +773,7 @@ class StateManager:
         ]
 
         for req in self.state.requirements:
-            status_icon = {
-                RequirementStatus.PENDING: "⏳",
-                RequirementStatus.ANALYZING: "🔍",
-                RequirementStatus.ANALYZED: "📋",
-                RequirementStatus.GENERATING: "⚙️",
-                RequirementStatus.COMPLETED: "✅",
-                RequirementStatus.FAILED: "❌",
-                RequirementStatus.REVIEW: "👀"
-            }.get(req.status, "?")
+            status_icon = _STATUS_ICONS.get(req.status, "?")
 
             lines.append(f"\n{status_icon} {req.id}: {req.status.value}")
             lines.append(f"   Текст: {req.text[:80]}{'...' if len(req.text) > 80 else ''}")
@@ -671,6 +797,7 @@ class StateManager:
         if self.state_file.exists():
             self.state_file.unlink()
         self.state = None
+        self._save_pending = False
         logger.info("Состояние очищено")
 
     # =========================================================================
@@ -679,22 +806,24 @@ class StateManager:
 
     def _session_to_dict(self, session: SessionState) -> dict:
         """Конвертирует сессию в словарь для JSON."""
-        def convert(obj):
-            if hasattr(obj, "__dict__"):
-                result = {}
-                for key, value in obj.__dict__.items():
-                    if isinstance(value, Enum):
-                        result[key] = value.value
-                    elif isinstance(value, list):
-                        result[key] = [convert(item) for item in value]
-                    elif hasattr(value, "__dict__"):
-                        result[key] = convert(value)
-                    else:
-                        result[key] = value
-                return result
-            return obj
-
-        return convert(session)
+        # Структура сессии известна: копируем __dict__ каждого уровня и заменяем только
+        # вложенные объекты и статус — без проверки типа каждого значения.
+        # Списки и словари внутри не копируются: результат сразу сериализуется
+        data = dict(session.__dict__)
+        data["requirements"] = [self._requirement_to_dict(req) for req in session.requirements]
+        data["progress"] = dict(session.progress.__dict__)
+        return data
+
+    @staticmethod
+    def _requirement_to_dict(req: RequirementState) -> dict:
+        """Конвертирует требование (с анализом и тест-кейсами) в словарь для JSON."""
+        data = dict(req.__dict__)
+        if isinstance(req.status, Enum):
+            data["status"] = req.status.value
+        if req.analysis is not None:
+            data["analysis"] = dict(req.analysis.__dict__)
+        data["test_cases"] = [dict(tc.__dict__) for tc in req.test_cases]
+        return data
 
     def _dict_to_session(self, data: dict) -> SessionState:
         """Конвертирует словарь в сессию."""
@@ -710,8 +839,9 @@ class StateManager:
             test_cases = []
             for tc_data in req_data.get("test_cases", []):
                 # Добавляем defaults для новых полей при десериализации старых данных
-                tc_data.setdefault("layer", "api")
-                tc_data.setdefault("component", "fullstack")
+                # Метки повторяются у тысяч тест-кейсов — храним один экземпляр строки
+                tc_data["layer"] = _intern_label(tc_data.get("layer", "api"))
+                tc_data["component"] = _intern_label(tc_data.get("component", "fullstack"))
                 tc_data.setdefault("tags", [])
                 tc_data.setdefault("ui_element", None)
                 tc_data.setdefault("api_endpoint", None)
@@ -722,7 +852,7 @@ class StateManager:
                 text=req_data["text"],
                 source=req_data["source"],
                 source_ref=req_data.get("source_ref"),
-                status=RequirementStatus(req_data.get("status", "pending")),
+                status=_parse_status(req_data.get("status", "pending")),
                 analysis=analysis,
                 test_cases=test_cases,
                 hash=req_data.get("hash", ""),
@@ -730,8 +860,8 @@ class StateManager:
                 processed_at=req_data.get("processed_at"),
                 error=req_data.get("error"),
                 # Новые поля с defaults для обратной совместимости
-                layer=req_data.get("layer", "api"),
-                component=req_data.get("component", "fullstack"),
+                layer=_intern_label(req_data.get("layer", "api")),
+                component=_intern_label(req_data.get("component", "fullstack")),
                 tags=req_data.get("tags", []),
                 title=req_data.get("title")
             )
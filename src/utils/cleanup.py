@@ -6,14 +6,77 @@
 Подготавливает проект к новым генерациям.
 """
 import argparse
+import fnmatch
+import os
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from typing import Callable, Optional
 
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Параллельное удаление: порог числа путей и максимум потоков
+_PARALLEL_MIN_PATHS = 4
+_MAX_DELETE_WORKERS = 8
+
+# Директории, в которые обход проекта не заходит
+_EXCLUDE_DIRS = frozenset({"venv", ".venv", "node_modules", ".git"})
+
+
+def _compile_patterns(patterns: tuple[str, ...]) -> re.Pattern:
+    """Объединяет glob-шаблоны имен в одно регулярное выражение."""
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns))
+
+
+_STATE_FILES_RE = _compile_patterns((
+    ".test_generator_state.json",
+    ".test_generator_state.*.json",
+))
+_EXPORT_FILES_RE = _compile_patterns((
+    "test_cases*.xlsx",
+    "test_cases*.csv",
+    "tests*.xlsx",
+    "tests*.csv",
+))
+_CACHE_DIRS_RE = _compile_patterns((
+    "__pycache__",
+    ".pytest_cache",
+    "*.egg-info",
+    ".mypy_cache",
+    ".ruff_cache",
+))
+_TEMP_FILES_RE = _compile_patterns((
+    "*.pyc",
+    ".DS_Store",
+    "Thumbs.db",
+    "*.tmp",
+    "*~",
+))
+
+
+def _apply_to_paths(func: Callable[[Path], object], paths: list[Path]) -> list[tuple[Path, Optional[Exception]]]:
+    """
+    Применяет func к каждому пути; возвращает (путь, ошибка или None) в исходном порядке.
+
+    Удаление упирается в операции ФС, а не в CPU, поэтому при числе путей больше
+    _PARALLEL_MIN_PATHS вызовы выполняются в пуле потоков.
+    """
+    def run(path: Path) -> tuple[Path, Optional[Exception]]:
+        try:
+            func(path)
+            return path, None
+        except Exception as e:
+            return path, e
+
+    if len(paths) <= _PARALLEL_MIN_PATHS:
+        return [run(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=min(_MAX_DELETE_WORKERS, len(paths))) as executor:
+        return list(executor.map(run, paths))
+
 
 class Cleanup:
     """Утилита очистки проекта."""
@@ -26,14 +89,7 @@ class Cleanup:
 
     def get_state_files(self) -> list[Path]:
         """Возвращает список state файлов."""
-        patterns = [
-            ".test_generator_state.json",
-            ".test_generator_state.*.json",
-        ]
-        files = []
-        for pattern in patterns:
-            files.extend(self.project_root.glob(pattern))
-        return files
+        return self._list_root(_STATE_FILES_RE)
 
     def get_log_files(self) -> list[Path]:
         """Возвращает список лог файлов."""
@@ -44,34 +100,11 @@ class Cleanup:
 
     def get_cache_dirs(self) -> list[Path]:
         """Возвращает список кэш директорий (исключая venv)."""
-        patterns = [
-            "__pycache__",
-            ".pytest_cache",
-            "*.egg-info",
-            ".mypy_cache",
-            ".ruff_cache",
-        ]
-        exclude = {"venv", ".venv", "node_modules", ".git"}
-        dirs = []
-        for pattern in patterns:
-            for d in self.project_root.rglob(pattern):
-                # Исключаем директории внутри venv и подобных
-                if not any(part in exclude for part in d.parts):
-                    dirs.append(d)
-        return [d for d in dirs if d.is_dir()]
+        return self._walk(_CACHE_DIRS_RE, dirs=True)
 
     def get_export_files(self) -> list[Path]:
         """Возвращает список экспортированных файлов в корне проекта."""
-        patterns = [
-            "test_cases*.xlsx",
-            "test_cases*.csv",
-            "tests*.xlsx",
-            "tests*.csv",
-        ]
-        files = []
-        for pattern in patterns:
-            files.extend(self.project_root.glob(pattern))
-        return files
+        return self._list_root(_EXPORT_FILES_RE)
 
     def get_artifacts_files(self) -> list[Path]:
         """Возвращает список файлов в директории artifacts."""
@@ -81,20 +114,47 @@ class Cleanup:
 
     def get_temp_files(self) -> list[Path]:
         """Возвращает список временных файлов (исключая venv)."""
-        patterns = [
-            "*.pyc",
-            ".DS_Store",
-            "Thumbs.db",
-            "*.tmp",
-            "*~",
-        ]
-        exclude = {"venv", ".venv", "node_modules", ".git"}
-        files = []
-        for pattern in patterns:
-            for f in self.project_root.rglob(pattern):
-                if not any(part in exclude for part in f.parts):
-                    files.append(f)
-        return [f for f in files if f.is_file()]
+        return self._walk(_TEMP_FILES_RE, dirs=False)
+
+    def _list_root(self, pattern: re.Pattern) -> list[Path]:
+        """Возвращает элементы корня проекта с подходящим именем."""
+        try:
+            with os.scandir(self.project_root) as it:
+                return [Path(entry.path) for entry in it if pattern.match(entry.name)]
+        except OSError:
+            return []
+
+    def _walk(self, pattern: re.Pattern, dirs: bool) -> list[Path]:
+        """
+        Обходит проект один раз и возвращает директории или файлы с подходящим именем.
+
+        Исключенные директории (venv и т.п.) отсекаются до спуска в них, симлинки
+        на директории не обходятся. В найденные директории обход не спускается:
+        они удаляются целиком.
+        """
+        if any(part in _EXCLUDE_DIRS for part in self.project_root.parts):
+            return []
+
+        found = []
+        stack = [self.project_root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name in _EXCLUDE_DIRS:
+                    continue
+                if pattern.match(entry.name):
+                    if dirs and entry.is_dir():
+                        found.append(Path(entry.path))
+                        continue
+                    if not dirs and entry.is_file():
+                        found.append(Path(entry.path))
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+        return found
 
     def clean_state(self, dry_run: bool = False) -> int:
         """Удаляет state файлы."""
@@ -146,13 +206,54 @@ class Cleanup:
         
         try:
             import shutil
-            shutil.copytree(self.artifacts_dir, backup_dir)
+            try:
+                shutil.copytree(self.artifacts_dir, backup_dir, copy_function=self._link_or_copy)
+            except OSError:
+                # Другая ФС или ссылки не поддерживаются — обычное копирование
+                shutil.rmtree(backup_dir, ignore_errors=True)
+                shutil.copytree(self.artifacts_dir, backup_dir)
             logger.info(f"Создан бэкап: {backup_dir}")
             return True
         except Exception as e:
             logger.error(f"Ошибка создания бэкапа: {e}")
             return False
 
+    def _link_or_copy(self, src: str, dst: str):
+        """
+        Функция копирования для бэкапа artifacts.
+
+        Файлы верхнего уровня clean_artifacts только удаляет, поэтому вместо копии
+        достаточно жесткой ссылки. Вложенные файлы остаются на месте и могут быть
+        перезаписаны, поэтому их копируем.
+        """
+        import shutil
+        if Path(src).parent == self.artifacts_dir:
+            os.link(src, dst)
+        else:
+            shutil.copy2(src, dst)
+
+    def _unshare_artifacts(self):
+        """
+        Заменяет копией файлы artifacts, которые не удалось удалить после бэкапа.
+
+        Такой файл делит inode с жесткой ссылкой в бэкапе, и экспорт, перезаписывающий
+        его на месте, изменил бы и бэкап.
+        """
+        import shutil
+        for f in self.get_artifacts_files():
+            try:
+                if f.stat().st_nlink < 2:
+                    continue
+                tmp_path = f.with_name(f.name + ".tmp")
+                try:
+                    shutil.copy2(f, tmp_path)
+                    os.replace(tmp_path, f)
+                except BaseException:
+                    tmp_path.unlink(missing_ok=True)
+                    raise
+            except OSError as e:
+                logger.error(f"Ошибка отвязки {f} от бэкапа: {e}")
+
     def prepare_for_new_generation(self, dry_run: bool = False, backup: bool = True) -> dict:
         """
         Подготавливает проект к новой генерации тестов.
@@ -187,6 +288,8 @@ class Cleanup:
         # Очистка artifacts (если есть бэкап или бэкап не требуется)
         if not backup or results.get("backup", 0) > 0 or dry_run:
             results["artifacts"] = self.clean_artifacts(dry_run)
+            if results.get("backup", 0) > 0:
+                self._unshare_artifacts()
         
         # Очистка кэша и временных файлов
         results["cache"] = self.clean_cache(dry_run)
@@ -220,36 +323,38 @@ class Cleanup:
 
     def _delete_files(self, files: list[Path], category: str, dry_run: bool) -> int:
         """Удаляет список файлов."""
-        count = 0
-        for f in files:
-            if dry_run:
+        if dry_run:
+            for f in files:
                 logger.info(f"[DRY-RUN] Будет удален ({category}): {f}")
+            return len(files)
+
+        count = 0
+        for f, error in _apply_to_paths(Path.unlink, files):
+            if error is None:
+                logger.info(f"Удален ({category}): {f}")
+                self.deleted_files.append(f)
+                count += 1
             else:
-                try:
-                    f.unlink()
-                    logger.info(f"Удален ({category}): {f}")
-                    self.deleted_files.append(f)
-                    count += 1
-                except Exception as e:
-                    logger.error(f"Ошибка удаления {f}: {e}")
-        return count if not dry_run else len(files)
+                logger.error(f"Ошибка удаления {f}: {error}")
+        return count
 
     def _delete_dirs(self, dirs: list[Path], category: str, dry_run: bool) -> int:
         """Удаляет список директорий."""
         import shutil
-        count = 0
-        for d in dirs:
-            if dry_run:
+        if dry_run:
+            for d in dirs:
                 logger.info(f"[DRY-RUN] Будет удалена ({category}): {d}")
+            return len(dirs)
+
+        count = 0
+        for d, error in _apply_to_paths(shutil.rmtree, dirs):
+            if error is None:
+                logger.info(f"Удалена ({category}): {d}")
+                self.deleted_dirs.append(d)
+                count += 1
             else:
-                try:
-                    shutil.rmtree(d)
-                    logger.info(f"Удалена ({category}): {d}")
-                    self.deleted_dirs.append(d)
-                    count += 1
-                except Exception as e:
-                    logger.error(f"Ошибка удаления {d}: {e}")
-        return count if not dry_run else len(dirs)
+                logger.error(f"Ошибка удаления {d}: {error}")
+        return count
 
     def print_summary(self, results: dict, dry_run: bool):
         """Выводит итоги очистки."""
@@ -4,7 +4,9 @@ Input validation and size limits for security (OWASP A04).
 
 Validates input sizes, formats, and prevents resource exhaustion attacks.
 """
+import errno
 import os
+import stat
 from pathlib import Path
 from typing import Tuple
 
@@ -12,6 +14,9 @@ from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Ошибки stat, при которых Path.exists() возвращает False
+_MISSING_PATH_ERRNOS = frozenset({errno.ENOENT, errno.ENOTDIR, errno.EBADF, errno.ELOOP})
+
 # Security limits
 MAX_REQUIREMENT_LENGTH = 10000  # characters
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
@@ -55,13 +60,18 @@ def validate_file_size(file_path: Path) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if not file_path.exists():
+    # One stat call instead of separate exists()/is_file()/stat()
+    try:
+        file_stat = os.stat(file_path)
+    except OSError as e:
+        if e.errno not in _MISSING_PATH_ERRNOS:
+            raise
         return False, f"File not found: {file_path}"
     
-    if not file_path.is_file():
+    if not stat.S_ISREG(file_stat.st_mode):
         return False, f"Not a file: {file_path}"
     
-    file_size = file_path.stat().st_size
+    file_size = file_stat.st_size
     
     if file_size > MAX_FILE_SIZE:
         logger.warning(f"File too large: {file_size} bytes > {MAX_FILE_SIZE} bytes")
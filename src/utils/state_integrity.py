@@ -329,6 +329,50 @@ def create_backup(file_path: Path) -> Optional[Path]:
         return None
 
 
+def replace_with_backup(file_path: Path, content: bytes) -> None:
+    """
+    Atomically replace state file content, keeping the previous version as backup.
+    
+    The new content goes to a temporary file (mode 0600, fsynced) that is renamed
+    over the state file, so readers never see a partially written state. The previous version becomes
+    the backup via a hard link instead of a copy (falls back to create_backup
+    where hard links are not supported).
+    
+    Args:
+        file_path: Path to state file
+        content: New file content
+    """
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        try:
+            # Mode from os.open applies only to a newly created file
+            os.fchmod(fd, 0o600)
+            view = memoryview(content)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except BaseException:
+        # Do not leave a partial temp file behind (e.g. on ENOSPC)
+        tmp_path.unlink(missing_ok=True)
+        raise
+    
+    if file_path.exists():
+        backup_path = file_path.with_suffix('.json.backup')
+        backup_tmp_path = backup_path.with_name(backup_path.name + '.tmp')
+        try:
+            backup_tmp_path.unlink(missing_ok=True)
+            os.link(file_path, backup_tmp_path)
+            os.replace(backup_tmp_path, backup_path)
+            logger.debug(f"Created backup: {backup_path}")
+        except OSError:
+            create_backup(file_path)
+    
+    os.replace(tmp_path, file_path)
+
+
 def restore_from_backup(file_path: Path) -> bool:
     """
     Restore state file from backup.
@@ -373,6 +417,7 @@ __all__ = [
     'sign_state_file',
     'validate_state_file',
     'create_backup',
+    'replace_with_backup',
     'restore_from_backup',
     'STATE_SCHEMA',
 ]
@@ -201,11 +201,40 @@ class TestGeneratorHelper:
             for req in pending
         ]
     
+    def get_pending_requirements_with_text(self) -> List[Dict[str, str]]:
+        """
+        Возвращает необработанные требования вместе с полным текстом.
+
+        Заменяет get_pending_requirements + get_requirement_text на каждое
+        требование: сессия читается один раз, без поиска по id.
+
+        Returns:
+            Список требований с id, полным текстом и источником
+        """
+        session = self.sm.load()
+        if not session:
+            logger.warning("Сессия не найдена")
+            return []
+
+        return [
+            {
+                'id': req.id,
+                'text': self._full_text(req),
+                'source': req.source
+            }
+            for req in self.sm.get_pending_requirements()
+        ]
+
     def get_requirement_text(self, req_id: str) -> str:
         """Возвращает полный текст требования (структурированный, если есть)."""
         req = self.sm.find_requirement_by_id(req_id)
         if not req:
             raise ValueError(f"Требование {req_id} не найдено")
+        return self._full_text(req)
+
+    @staticmethod
+    def _full_text(req) -> str:
+        """Текст требования для генерации: структурированный, если есть."""
         structured_text = getattr(req, "structured_text", None)
         if structured_text:
             return structured_text